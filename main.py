@@ -1,8 +1,27 @@
-from src.gui.main_window import BilibiliDownloaderGUI
+import sys
+from src.utils.startup import startup_timer
+
 
 def main():
+    # 带参数运行时进入无界面的命令行批量模式，不导入任何GUI模块
+    if len(sys.argv) > 1:
+        from src.cli import run_cli
+        sys.exit(run_cli(sys.argv[1:]))
+
+    startup_timer.install()
+    from src.gui.main_window import BilibiliDownloaderGUI
+    startup_timer.mark("导入GUI模块")
     app = BilibiliDownloaderGUI()
+    startup_timer.mark("创建主窗口")
+    startup_timer.uninstall()
+
+    def on_first_window():
+        # 主循环空闲时窗口已经显示，记录启动耗时报告
+        startup_timer.mark("首个窗口显示")
+        app.logger.log_to_file(startup_timer.report())
+
+    app.root.after_idle(on_first_window)
     app.run()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
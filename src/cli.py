@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict
+from typing import List, Optional
+
+# 退出码
+EXIT_OK = 0  # 全部成功（或已下载过而跳过）
+EXIT_FAILED = 1  # 有视频下载失败
+EXIT_USAGE = 2  # 参数错误（argparse的默认退出码）
+EXIT_NO_BV = 3  # 输入中没有找到BV号
+EXIT_NO_BBDOWN = 4  # 找不到BBDown
+EXIT_LOGIN_REQUIRED = 5  # 启用了强制登录但未登录
+EXIT_INTERRUPTED = 130  # 被Ctrl+C中断
+
+
+class JsonLinesReporter:
+    """以JSON Lines格式向stdout输出下载事件（多线程安全）"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields):
+        record = {"event": event, "time": round(time.time(), 3)}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="无界面批量下载B站视频，进度以JSON Lines格式输出到stdout。不带参数运行时启动图形界面。"
+    )
+    parser.add_argument("source", nargs="?", default="-",
+                        help="包含BV号/av号/视频链接的文本文件，'-' 表示从stdin读取（默认）")
+    parser.add_argument("-j", "--concurrency", type=int, default=None,
+                        help="同时运行的BBDown进程数（默认使用配置中的 max_concurrency）")
+    parser.add_argument("-o", "--save-path", default=None,
+                        help="视频保存目录（只对本次运行生效）")
+    parser.add_argument("--bbdown", default=None,
+                        help="BBDown可执行文件路径（只对本次运行生效）")
+    parser.add_argument("--no-login", action="store_true",
+                        help="不要求登录，允许未登录时以低画质下载")
+    parser.add_argument("--no-skip", action="store_true",
+                        help="不跳过BBDown.archives中已记录的视频")
+    parser.add_argument("--encoding", default="utf-8",
+                        help="输入文件编码（默认utf-8）")
+    return parser
+
+
+def run_cli(argv: Optional[List[str]] = None) -> int:
+    """命令行批量下载入口，返回退出码"""
+    args = build_parser().parse_args(argv)
+
+    # stdout只用于JSON Lines，其他模块的print输出改到stderr
+    reporter = JsonLinesReporter(sys.stdout)
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        return _run(args, reporter)
+    finally:
+        sys.stdout = stdout
+
+
+def _run(args: argparse.Namespace, reporter: JsonLinesReporter) -> int:
+    from .core.bv_extractor import iter_jobs_from_file
+    from .core.downloader import VideoDownloader
+    from .utils.config import sync_bbdown_path
+    from .utils.logger import VideoLogger
+
+    logger = VideoLogger()
+    logger.register_callback(lambda message, level: reporter.emit(
+        "log", level=level.value, message=message))
+
+    downloader = VideoDownloader(logger)
+    config = downloader.config
+    if args.save_path:
+        config.set_override("save_path", os.path.abspath(args.save_path))
+    if args.bbdown:
+        config.set_override("bbdown_path", os.path.abspath(args.bbdown))
+    else:
+        sync_bbdown_path()
+    if args.no_login:
+        config.set_override("need_login", False)
+
+    bbdown_path = config.bbdown_path
+    if not bbdown_path or not os.path.exists(bbdown_path):
+        reporter.emit("error", code=EXIT_NO_BBDOWN, message=f"找不到BBDown: {bbdown_path or '未配置'}")
+        return EXIT_NO_BBDOWN
+    is_login = config.is_login
+    if config.need_login and not is_login:
+        reporter.emit("error", code=EXIT_LOGIN_REQUIRED,
+                      message="已启用强制登录但当前未登录，请先在图形界面登录或使用 --no-login")
+        return EXIT_LOGIN_REQUIRED
+
+    counts = {"found": 0, "success": 0, "failed": 0, "skipped": 0}
+    counts_lock = threading.Lock()
+    started = time.monotonic()
+
+    def on_result(key: str, success: bool, error_msg: str = None):
+        with counts_lock:
+            counts["success" if success else "failed"] += 1
+        reporter.emit("done", bv=key, success=success, reason=error_msg)
+
+    def on_skip(key: str):
+        with counts_lock:
+            counts["skipped"] += 1
+        reporter.emit("skipped", bv=key, reason="已下载过")
+
+    def on_progress(event):
+        fields = asdict(event)
+        fields["stage"] = event.stage.name.lower()
+        reporter.emit("progress", **fields)
+
+    def counted(jobs):
+        for job in jobs:
+            counts["found"] += 1
+            yield job
+
+    # 此时 sys.stdin 未被重定向
+    source = sys.stdin if args.source == "-" else args.source
+    try:
+        jobs = counted(iter_jobs_from_file(source, encoding=args.encoding))
+        if not args.no_skip:
+            jobs = downloader.filter_downloaded(jobs, on_skip)
+        downloader.download_batch(
+            jobs, is_login, on_result, args.concurrency, on_progress,
+            lambda key: reporter.emit("start", bv=key)
+        )
+    except KeyboardInterrupt:
+        reporter.emit("error", code=EXIT_INTERRUPTED, message="已中断")
+        return EXIT_INTERRUPTED
+    except OSError as e:
+        reporter.emit("error", code=EXIT_USAGE, message=f"读取输入失败: {e}")
+        return EXIT_USAGE
+
+    reporter.emit("summary", total=counts["found"], success=counts["success"],
+                  failed=counts["failed"], skipped=counts["skipped"],
+                  elapsed=round(time.monotonic() - started, 3))
+    if not counts["found"]:
+        return EXIT_NO_BV
+    return EXIT_FAILED if counts["failed"] else EXIT_OK
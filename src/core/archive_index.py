@@ -0,0 +1,96 @@
+import os
+import threading
+from typing import Callable, Iterable, Iterator, Optional
+from .bvid import AidSet, bv_to_aid
+
+ARCHIVE_FILE_NAME = "BBDown.archives"
+
+
+class ArchiveIndex:
+    """
+    BBDown.archives 的内存索引
+
+    BBDown（--save-archives-to-file）把已完成的aid以"|"分隔追加到该文件。
+    索引按文件的 mtime/大小 判断是否需要重新加载：文件变长时只读取新增部分，
+    变短或被替换时才完整重读。
+    """
+
+    def __init__(self, archive_path: str):
+        self.archive_path = archive_path
+        self._aids = AidSet()
+        self._offset = 0  # 已解析到的字节位置（总是停在"|"之后）
+        self._stat_key = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_bbdown(cls, bbdown_path: str) -> "ArchiveIndex":
+        """BBDown把归档文件写在自己的程序目录下"""
+        return cls(os.path.join(os.path.dirname(bbdown_path), ARCHIVE_FILE_NAME))
+
+    def refresh(self) -> bool:
+        """文件有变化时重新加载，返回是否加载了新内容"""
+        with self._lock:
+            try:
+                stat = os.stat(self.archive_path)
+            except OSError:
+                self._reset(None)
+                return False
+
+            stat_key = (stat.st_mtime_ns, stat.st_size)
+            if stat_key == self._stat_key:
+                return False
+            if stat.st_size < self._offset:
+                # 文件被截断或替换，完整重读
+                self._reset(None)
+
+            try:
+                with open(self.archive_path, "rb") as f:
+                    f.seek(self._offset)
+                    data = f.read()
+            except OSError as e:
+                print(f"读取下载归档失败: {e}")
+                return False
+
+            # 最后一段可能是正在写入的半个数字，留到下次再解析
+            end = data.rfind(b"|") + 1
+            self._aids.update(
+                int(item) for item in data[:end].split(b"|") if item.strip().isdigit()
+            )
+            self._offset += end
+            self._stat_key = stat_key
+            return end > 0
+
+    def _reset(self, stat_key):
+        self._aids = AidSet()
+        self._offset = 0
+        self._stat_key = stat_key
+
+    def contains_aid(self, aid: int) -> bool:
+        """aid是否已下载"""
+        self.refresh()
+        return aid in self._aids
+
+    def contains_bv(self, bv: str) -> bool:
+        """BV号是否已下载，无效BV号视为未下载"""
+        try:
+            aid = bv_to_aid(bv)
+        except ValueError:
+            return False
+        return self.contains_aid(aid)
+
+    def filter_new(self, bv_list: Iterable, on_skip: Optional[Callable[[str], None]] = None) -> Iterator:
+        """
+        惰性过滤掉已下载的BV号，跳过时调用 on_skip(key)
+
+        元素可以是BV号字符串或 BVJob（BBDown对已归档的视频整体跳过，分P任务也一样）
+        """
+        for item in bv_list:
+            if self.contains_bv(getattr(item, "bv", item)):
+                if on_skip:
+                    on_skip(getattr(item, "key", item))
+            else:
+                yield item
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._aids)
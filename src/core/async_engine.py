@@ -0,0 +1,144 @@
+import asyncio
+import re
+import threading
+from concurrent.futures import Future
+from typing import AsyncIterator, Callable, Coroutine, List, Optional
+from ..utils import launcher
+from .watchdog import ProcessStalled, StallWatchdog
+
+# BBDown的进度条使用\r刷新同一行，这里把\r和\n都当作行结束符
+_LINE_SPLIT = re.compile(rb"[\r\n]")
+
+
+class BBDownProcessEngine:
+    """
+    基于asyncio的BBDown进程引擎
+
+    所有子进程都由同一个后台事件循环线程监督，
+    下载数量再多也不会为每个进程占用一个读取线程。
+    """
+
+    def __init__(self, encoding: str = "utf-8", chunk_size: int = 4096,
+                 max_line_length: int = 64 * 1024):
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.max_line_length = max_line_length
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """获取（必要时启动）后台事件循环"""
+        with self._start_lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def _run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                thread = threading.Thread(target=_run, name="bbdown-engine", daemon=True)
+                thread.start()
+                ready.wait()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def run_coroutine(self, coro: Coroutine) -> Future:
+        """在引擎的事件循环中运行协程，返回可在任意线程等待的Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def submit(self, cmd: List[str],
+               on_line: Optional[Callable[[str], None]] = None) -> Future:
+        """启动一个进程，返回其退出码的Future"""
+        return self.run_coroutine(self.run_process(cmd, on_line))
+
+    async def run_process(self, cmd: List[str],
+                          on_line: Optional[Callable[[str], None]] = None,
+                          watchdog: Optional[StallWatchdog] = None,
+                          on_spawn: Optional[Callable[[], None]] = None) -> int:
+        """
+        运行进程并逐行回调输出，返回退出码
+
+        指定 watchdog 时进程停滞会被终止，并抛出 ProcessStalled；
+        on_spawn 在进程启动后立即调用
+        """
+        process = await self.spawn(cmd)
+        if on_spawn:
+            on_spawn()
+
+        async def _read():
+            async for line in self.iter_lines(process.stdout):
+                if watchdog:
+                    watchdog.touch()
+                if on_line:
+                    on_line(line)
+
+        # 读取输出作为单独的任务，停滞时由看门狗取消
+        reader = asyncio.ensure_future(_read())
+        guard = asyncio.ensure_future(watchdog.guard(process, reader)) if watchdog else None
+        try:
+            try:
+                await reader
+            except asyncio.CancelledError:
+                if not (watchdog and watchdog.stalled and reader.cancelled()):
+                    raise
+            if watchdog and watchdog.stalled:
+                # 被终止的进程的子进程可能仍持有管道，不等待管道关闭
+                raise ProcessStalled(watchdog.stalled_for)
+            return_code = await process.wait()
+        except BaseException:
+            # 读取被取消或回调出错时不留下孤儿进程
+            if process.returncode is None:
+                process.kill()
+            raise
+        finally:
+            if not reader.done():
+                reader.cancel()
+            if guard is not None:
+                if not guard.done():
+                    guard.cancel()
+                await asyncio.gather(guard, return_exceptions=True)
+        return return_code
+
+    async def spawn(self, cmd: List[str]) -> asyncio.subprocess.Process:
+        """直接exec启动进程，stderr合并到stdout"""
+        return await launcher.create_subprocess(
+            cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+
+    async def iter_lines(self, stream: asyncio.StreamReader) -> AsyncIterator[str]:
+        """按块读取输出流并切分为去除首尾空白的非空行"""
+        buffer = b""
+        while True:
+            chunk = await stream.read(self.chunk_size)
+            if not chunk:
+                break
+            buffer += chunk
+            *lines, buffer = _LINE_SPLIT.split(buffer)
+            # 没有换行的超长输出也按行处理，避免缓冲区无限增长
+            if len(buffer) > self.max_line_length:
+                lines.append(buffer)
+                buffer = b""
+            for raw in lines:
+                line = raw.decode(self.encoding, errors="replace").strip()
+                if line:
+                    yield line
+        line = buffer.decode(self.encoding, errors="replace").strip()
+        if line:
+            yield line
+
+    def shutdown(self):
+        """停止后台事件循环"""
+        with self._start_lock:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+                self._loop.close()
+            self._loop = None
+            self._thread = None
@@ -0,0 +1,106 @@
+import io
+import re
+from dataclasses import dataclass
+from typing import IO, Iterable, Iterator, Optional, Union
+from .bvid import AidSet, aid_to_bv, bv_to_aid
+
+# BV号、av号及其视频链接形式，可带 ?p= 分P参数，例如：
+#   BV1xx411c7mD  av170001  https://www.bilibili.com/video/BV1xx411c7mD/?p=3&spm_id_from=...
+#   https://b23.tv/BV1xx411c7mD  bilibili.com/video/av170001?p=2
+_JOB_RE = re.compile(
+    r"(?:(BV[0-9A-Za-z]{10})|(?<![0-9A-Za-z])[aA][vV](\d{1,16})(?![0-9]))"
+    r"(?:/?\?(?:[^\s#&]*&){0,20}?p=(\d{1,5})(?![0-9]))?"
+)
+
+# 超过该长度还没遇到空白字符时，不再等待后续内容直接解析
+_MAX_PENDING = 64 * 1024
+
+
+@dataclass(frozen=True)
+class BVJob:
+    """一个下载任务：BV号，以及可选的分P"""
+    bv: str
+    page: Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        """任务的唯一标识，本身也是可被重新解析的文本"""
+        return self.bv if self.page is None else f"{self.bv}?p={self.page}"
+
+    @classmethod
+    def from_key(cls, key: str) -> "BVJob":
+        """从 key 还原任务"""
+        bv, _, page = key.partition("?p=")
+        return cls(bv, int(page) if page.isdigit() else None)
+
+
+def _normalize(match: re.Match) -> Optional[BVJob]:
+    bv, aid, page = match.groups()
+    if aid is not None:
+        try:
+            bv = aid_to_bv(int(aid))
+        except ValueError:
+            return None
+    return BVJob(bv, int(page) if page else None)
+
+
+def iter_jobs(chunks: Iterable[str]) -> Iterator[BVJob]:
+    """
+    从文本块流中增量提取下载任务
+
+    链接和av号统一转换为BV号，按首次出现的顺序去重；
+    匹配不会跨越空白字符，因此只需把每块末尾不完整的部分留到下一块。
+    """
+    seen_aids = AidSet()
+    seen_keys = set()  # 分P任务和无法解码的BV号
+    pending = ""
+
+    def _emit(text: str) -> Iterator[BVJob]:
+        for match in _JOB_RE.finditer(text):
+            job = _normalize(match)
+            if job is None:
+                continue
+            if job.page is None:
+                try:
+                    aid = bv_to_aid(job.bv)
+                except ValueError:
+                    aid = None
+                if aid is not None:
+                    if aid in seen_aids:
+                        continue
+                    seen_aids.add(aid)
+                    yield job
+                    continue
+            if job.key not in seen_keys:
+                seen_keys.add(job.key)
+                yield job
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        pending += chunk
+        # 最后一个空白字符之后的内容可能被截断，等待下一块
+        cut = max(pending.rfind(" "), pending.rfind("\n"), pending.rfind("\t"), pending.rfind("\r"))
+        if cut < 0 and len(pending) < _MAX_PENDING:
+            continue
+        if cut < 0:
+            cut = len(pending) - 1
+        ready, pending = pending[:cut + 1], pending[cut + 1:]
+        yield from _emit(ready)
+    if pending:
+        yield from _emit(pending)
+
+
+def iter_jobs_from_text(text: str, chunk_size: int = 64 * 1024) -> Iterator[BVJob]:
+    """从一段（可能很大的）文本中增量提取下载任务"""
+    return iter_jobs(text[i:i + chunk_size] for i in range(0, len(text), chunk_size))
+
+
+def iter_jobs_from_file(source: Union[str, IO[str]], encoding: str = "utf-8",
+                        chunk_size: int = 64 * 1024) -> Iterator[BVJob]:
+    """从文件路径或文本流（如 sys.stdin）中增量提取下载任务"""
+    if isinstance(source, str):
+        with io.open(source, "r", encoding=encoding, errors="replace") as f:
+            yield from iter_jobs(iter(lambda: f.read(chunk_size), ""))
+    else:
+        yield from iter_jobs(iter(lambda: source.read(chunk_size), ""))
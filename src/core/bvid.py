@@ -0,0 +1,181 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # NumPy为可选依赖，没有时使用纯Python实现
+    np = None
+
+_XOR_CODE = 23442827791579
+_MASK_CODE = (1 << 51) - 1
+_MAX_AID = 1 << 51
+_ALPHABET = "FcwAPNKTMug3GV5Lj7EJnHpWsx4tb8haYeviqBz6rkCy12mUSDQX9RdoZf"
+_BASE = len(_ALPHABET)
+_ENCODE_MAP = (8, 7, 0, 5, 1, 3, 2, 4, 6)
+_DECODE_MAP = tuple(reversed(_ENCODE_MAP))
+_PREFIX = "BV1"
+_BV_LENGTH = 12
+_CHAR_INDEX = {char: index for index, char in enumerate(_ALPHABET)}
+
+# 无法转换为aid的BV号的失败原因
+INVALID_BV_MESSAGE = "BV号无效"
+
+
+def bv_to_aid(bv: str) -> int:
+    """BV号转aid，BV号无效时抛出ValueError"""
+    if len(bv) != _BV_LENGTH or bv[:3].upper() != _PREFIX:
+        raise ValueError(f"无效的BV号: {bv}")
+    body = bv[3:]
+    value = 0
+    for position in _DECODE_MAP:
+        index = _CHAR_INDEX.get(body[position])
+        if index is None:
+            raise ValueError(f"无效的BV号: {bv}")
+        value = value * _BASE + index
+    return (value & _MASK_CODE) ^ _XOR_CODE
+
+
+def aid_to_bv(aid: int) -> str:
+    """aid转BV号"""
+    if not 0 < aid < _MAX_AID:
+        raise ValueError(f"无效的aid: {aid}")
+    chars = [""] * len(_ENCODE_MAP)
+    value = (_MAX_AID | aid) ^ _XOR_CODE
+    for position in _ENCODE_MAP:
+        chars[position] = _ALPHABET[value % _BASE]
+        value //= _BASE
+    return _PREFIX + "".join(chars)
+
+
+def is_valid_bv(bv: str) -> bool:
+    """判断BV号能否转换为aid"""
+    try:
+        bv_to_aid(bv)
+        return True
+    except ValueError:
+        return False
+
+
+# 批量转换时超过该数量才使用NumPy向量化
+_NUMPY_THRESHOLD = 256
+
+
+def bvs_to_aids(bvs: Sequence[str]) -> array:
+    """批量BV号转aid，返回 array('q')，无效的BV号对应0"""
+    if np is not None and len(bvs) >= _NUMPY_THRESHOLD:
+        return array("q", _bvs_to_aids_numpy(bvs).tobytes())
+    result = array("q")
+    for bv in bvs:
+        try:
+            result.append(bv_to_aid(bv))
+        except ValueError:
+            result.append(0)
+    return result
+
+
+def aids_to_bvs(aids: Iterable[int]) -> List[str]:
+    """批量aid转BV号"""
+    aids = list(aids)
+    if np is not None and len(aids) >= _NUMPY_THRESHOLD:
+        return _aids_to_bvs_numpy(aids)
+    return [aid_to_bv(aid) for aid in aids]
+
+
+def _bvs_to_aids_numpy(bvs: Sequence[str]):
+    lookup = np.full(256, -1, dtype=np.int64)
+    lookup[np.frombuffer(_ALPHABET.encode("ascii"), dtype=np.uint8)] = np.arange(_BASE)
+
+    # 长度不对或含非ASCII字符的BV号先替换成占位符，最后统一置0
+    placeholder = b"?" * _BV_LENGTH
+    encoded = []
+    for bv in bvs:
+        raw = bv.encode("ascii", errors="replace")
+        encoded.append(raw if len(raw) == _BV_LENGTH and raw[:3].upper() == b"BV1" else placeholder)
+    matrix = np.frombuffer(b"".join(encoded), dtype=np.uint8).reshape(-1, _BV_LENGTH)
+
+    digits = lookup[matrix[:, 3:]]
+    valid = (digits >= 0).all(axis=1)
+    value = np.zeros(len(bvs), dtype=np.int64)
+    for position in _DECODE_MAP:
+        value = value * _BASE + digits[:, position]
+    aids = (value & _MASK_CODE) ^ _XOR_CODE
+    aids[~valid] = 0
+    return aids
+
+
+def _aids_to_bvs_numpy(aids: List[int]) -> List[str]:
+    values = np.asarray(aids, dtype=np.int64)
+    if ((values <= 0) | (values >= _MAX_AID)).any():
+        raise ValueError("存在无效的aid")
+    values = (values | _MAX_AID) ^ _XOR_CODE
+    alphabet = np.frombuffer(_ALPHABET.encode("ascii"), dtype=np.uint8)
+    chars = np.empty((len(aids), _BV_LENGTH), dtype=np.uint8)
+    chars[:, :3] = np.frombuffer(_PREFIX.encode("ascii"), dtype=np.uint8)
+    for position in _ENCODE_MAP:
+        chars[:, 3 + position] = alphabet[values % _BASE]
+        values //= _BASE
+    text = chars.tobytes().decode("ascii")
+    return [text[i:i + _BV_LENGTH] for i in range(0, len(text), _BV_LENGTH)]
+
+
+class AidSet:
+    """
+    紧凑的aid集合
+
+    主体是有序的 array('q')，每个元素固定占8字节，用二分查找判断成员；
+    新加入的aid先放在一个小的临时集合中，攒到一定数量后再合并进有序数组。
+    """
+
+    def __init__(self, aids: Iterable[int] = (), merge_threshold: int = 4096):
+        self._sorted = array("q")
+        self._pending = set()
+        self.merge_threshold = merge_threshold
+        self.update(aids)
+
+    def add(self, aid: int):
+        if aid in self:
+            return
+        self._pending.add(aid)
+        # 阈值随集合规模增长，使合并的总开销保持在线性对数级别
+        if len(self._pending) >= max(self.merge_threshold, len(self._sorted) // 8):
+            self._compact()
+
+    def update(self, aids: Iterable[int]):
+        for aid in aids:
+            self.add(aid)
+
+    def _compact(self):
+        if not self._pending:
+            return
+        new_items = sorted(self._pending)
+        self._pending = set()
+        merged = array("q")
+        if np is not None:
+            merged.frombytes(np.union1d(
+                np.frombuffer(self._sorted, dtype=np.int64) if self._sorted else np.empty(0, dtype=np.int64),
+                np.asarray(new_items, dtype=np.int64)
+            ).astype(np.int64).tobytes())
+        else:
+            # 临时集合与有序数组没有交集，直接归并即可
+            merged.extend(heapq.merge(self._sorted, new_items))
+        self._sorted = merged
+
+    def __contains__(self, aid: int) -> bool:
+        if aid in self._pending:
+            return True
+        index = bisect_left(self._sorted, aid)
+        return index < len(self._sorted) and self._sorted[index] == aid
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._pending)
+
+    def __iter__(self) -> Iterator[int]:
+        self._compact()
+        return iter(self._sorted)
+
+    @property
+    def nbytes(self) -> int:
+        """有序数组部分占用的字节数"""
+        return self._sorted.itemsize * len(self._sorted)
@@ -1,13 +1,115 @@
 import re
-from typing import List
-from ..utils.logger import VideoLogger
+import shlex
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+from ..utils.logger import VideoLogger, LogLevel
 from ..utils.config import Config
+from .bv_extractor import BVJob, iter_jobs_from_text
+
+# BBDown选择分P的参数
+_PAGE_OPTIONS = ("-p", "--select-page")
+# 由程序自己添加、需要从后缀中去掉的参数
+_WORK_DIR_OPTIONS = ("--work-dir",)
+
+
+def split_suffix(suffix: str) -> List[str]:
+    """
+    按shell规则拆分命令后缀，引号内的空格不会被拆开
+
+    不把反斜杠当作转义字符，以保留Windows路径；引号不匹配时抛出 ValueError
+    """
+    lexer = shlex.shlex(suffix, posix=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ""
+    lexer.escape = ""
+    return list(lexer)
+
+
+def _strip_options(parts: List[str], options: Tuple[str, ...]) -> List[str]:
+    """去掉指定的参数及其值（支持 --opt value 和 --opt=value 两种形式）"""
+    result = []
+    i = 0
+    while i < len(parts):
+        name = parts[i].split("=", 1)[0]
+        if name in options:
+            i += 1 if "=" in parts[i] else 2  # 跳过参数名和它的值
+        else:
+            result.append(parts[i])
+            i += 1
+    return result
+
+
+@dataclass(frozen=True)
+class CommandTemplate:
+    """根据某一版本配置预先生成的命令模板，生成单个BV号的命令时只需填入参数"""
+    bbdown_path: str
+    options: Tuple[str, ...]  # 后缀参数（不含--work-dir）
+    options_without_pages: Tuple[str, ...]  # 同上，另外去掉了分P参数
+    tail: Tuple[str, ...]  # --work-dir 和 --login 等固定追加的参数
+
+    @classmethod
+    def compile(cls, config: Config) -> "CommandTemplate":
+        """解析并校验配置，失败时抛出 ValueError"""
+        try:
+            parts = split_suffix(config.suffix)
+        except ValueError as e:
+            raise ValueError(f"命令后缀格式错误（{e}）: {config.suffix}") from e
+        return cls.from_parts(config, parts)
+
+    @classmethod
+    def from_parts(cls, config: Config, parts: List[str]) -> "CommandTemplate":
+        """由已拆分的后缀参数生成模板"""
+        options = _strip_options(parts, _WORK_DIR_OPTIONS)
+        tail = []
+        if config.save_path:
+            tail.extend(["--work-dir", config.save_path])
+        # 如果需要登录但未登录，添加--login参数
+        if config.need_login and not config.is_login:
+            tail.append("--login")
+        return cls(
+            bbdown_path=config.bbdown_path,
+            options=tuple(options),
+            options_without_pages=tuple(_strip_options(options, _PAGE_OPTIONS)),
+            tail=tuple(tail),
+        )
+
+    def render(self, bv: str, page: Optional[int] = None) -> List[str]:
+        """生成单个BV号的命令，page 不为空时只下载该分P"""
+        if page is None:
+            return [self.bbdown_path, bv, *self.options, *self.tail]
+        return [self.bbdown_path, bv, *self.options_without_pages, "-p", str(page), *self.tail]
+
 
 class CommandBuilder:
     """命令生成器"""
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, logger: Optional[VideoLogger] = None):
         self.config = config
-    
+        self.logger = logger
+        self._template: Optional[CommandTemplate] = None
+        self._template_version = None
+
+    @property
+    def template(self) -> CommandTemplate:
+        """当前配置对应的命令模板，配置变化时重新生成"""
+        version = self.config.version
+        if self._template is None or self._template_version != version:
+            try:
+                template = CommandTemplate.compile(self.config)
+            except ValueError as e:
+                # 退回到按空白拆分，保证仍能下载
+                self._report(f"{e}，将按空格拆分参数")
+                template = CommandTemplate.from_parts(self.config, self.config.suffix.split())
+            self._template = template
+            self._template_version = version
+        return self._template
+
+    def _report(self, message: str):
+        if self.logger:
+            self.logger.log_to_window(message, LogLevel.ERROR)
+            self.logger.log_to_file(message, LogLevel.ERROR)
+        else:
+            print(message)
+
     def build_commands(self, input_text: str) -> List[str]:
         """
         从输入文本构建下载命令列表
@@ -36,36 +138,9 @@ class CommandBuilder:
         print(commands)
         return commands
 
-    def build_command(self, bv: str, is_login: bool) -> List[str]:
-        """构建完整的下载命令"""
-        cmd = [self.config.bbdown_path]
-        
-        # 添加BV号
-        cmd.append(bv)
-        
-        # 添加后缀参数（不包含work-dir）
-        if self.config.suffix:
-            suffix_parts = self.config.suffix.split()
-            # 过滤掉--work-dir参数
-            filtered_parts = []
-            i = 0
-            while i < len(suffix_parts):
-                if suffix_parts[i] == "--work-dir":
-                    i += 2  # 跳过--work-dir和它的值
-                else:
-                    filtered_parts.append(suffix_parts[i])
-                    i += 1
-            cmd.extend(filtered_parts)
-            
-        # 添加保存路径
-        if self.config.save_path:
-            cmd.extend(["--work-dir", self.config.save_path])
-            
-        # 如果需要登录但未登录，添加--login参数
-        if self.config.need_login and not self.config.is_login:
-            cmd.append("--login")
-            
-        return cmd
+    def build_command(self, bv: str, is_login: bool, page: Optional[int] = None) -> List[str]:
+        """构建完整的下载命令，page 不为空时只下载该分P"""
+        return self.template.render(bv, page)
 
     def build_download_command(self, bv: str) -> List[str]:
         """构建下载命令参数"""
@@ -85,7 +160,9 @@ class CommandBuilder:
         return cmd
 
     def extract_valid_bvs(self, text: str) -> List[str]:
-        """从文本中提取有效的BV号"""
-        # 使用正则表达式匹配BV号（BV后面跟着10位字符）
-        pattern = r'BV[0-9A-Za-z]{10}'
-        return re.findall(pattern, text)
\ No newline at end of file
+        """从文本中提取BV号（支持链接、av号和分P形式，按出现顺序去重）"""
+        return [job.key for job in iter_jobs_from_text(text)]
+
+    def iter_jobs(self, text: str) -> Iterator[BVJob]:
+        """从文本中增量提取下载任务，边解析边产出"""
+        return iter_jobs_from_text(text)
\ No newline at end of file
@@ -1,10 +1,24 @@
 import subprocess
 import os
-from typing import Callable
+import time
+from typing import Callable, Iterable, Iterator, List, Optional, Union
 import threading
+from concurrent.futures import Future
 from ..utils.logger import VideoLogger, LogLevel
 from ..utils.config import Config
+from ..utils import launcher
+from ..utils.paths import app_paths
 from .command_builder import CommandBuilder
+from .async_engine import BBDownProcessEngine
+from .progress import BBDownProgressParser, ProgressEvent
+from .output_tail import OutputTail
+from .archive_index import ArchiveIndex
+from .bvid import INVALID_BV_MESSAGE, bv_to_aid, is_valid_bv
+from .bv_extractor import BVJob
+from .retry import FailureKind, RetryQueue, RetryScheduler, classify_failure
+from .rate_limiter import TokenBucket, get_spawn_limiter
+from .watchdog import ProcessStalled, StallWatchdog
+from .metrics import BatchMetrics, DownloadMetrics, get_exporter, registry
 import locale
 
 
@@ -13,55 +27,263 @@ class VideoDownloader:
         self.logger = logger
         self.active_downloads = 0
         self.config = Config()
-        self.command_builder = CommandBuilder(self.config)
+        self.command_builder = CommandBuilder(self.config, logger)
         self._lock = threading.Lock()
         # 获取系统默认编码
         self.system_encoding = locale.getpreferredencoding()
+        # 所有BBDown子进程共用一个asyncio事件循环
+        self.engine = BBDownProcessEngine(self.system_encoding)
+        self._archive_index: Optional[ArchiveIndex] = None
+        self.metrics = DownloadMetrics(registry)
 
-    def start_download(self, bv: str, is_login: bool, callback=None):
-        """开始下载视频"""
+    @property
+    def archive_index(self) -> ArchiveIndex:
+        """当前BBDown对应的下载归档索引"""
+        index = ArchiveIndex.for_bbdown(self.config.bbdown_path)
+        with self._lock:
+            if self._archive_index is None or \
+                    self._archive_index.archive_path != index.archive_path:
+                self._archive_index = index
+            return self._archive_index
+
+    @property
+    def spawn_limiter(self) -> TokenBucket:
+        """进程级共享的BBDown启动限速器（速率和容量来自配置）"""
+        return get_spawn_limiter(self.config.spawn_rate, self.config.spawn_burst)
+
+    def filter_downloaded(self, bv_list: Iterable[Union[str, BVJob]],
+                          on_skip: Optional[Callable[[str], None]] = None) -> Iterator[Union[str, BVJob]]:
+        """过滤掉BBDown.archives中已记录的BV号，避免为它们启动BBDown进程"""
+        return self.archive_index.filter_new(bv_list, on_skip)
+
+    def start_download(self, bv: str, is_login: bool, callback=None,
+                       progress_callback: Optional[Callable[[ProgressEvent], None]] = None):
+        """开始下载视频（兼容接口：阻塞直到下载结束）"""
+        future = self.submit_download(bv, is_login, callback, progress_callback)
+        try:
+            future.result()
+        except Exception as e:
+            if callback:
+                callback(False, str(e))
+
+    def submit_download(self, bv: str, is_login: bool, callback=None,
+                        progress_callback: Optional[Callable[[ProgressEvent], None]] = None,
+                        page: Optional[int] = None,
+                        batch: Optional[BatchMetrics] = None) -> Future:
+        """
+        提交下载任务到进程引擎，立即返回完成Future（结果为是否成功）
+
+        progress_callback 会收到由BBDown输出解析出的 ProgressEvent（已节流），
+        在引擎线程中被调用；page 不为空时只下载该分P；
+        耗时和字节数记入全局指标，batch 不为空时同时计入该批次
+        """
+        return self.engine.run_coroutine(
+            self._download(bv, is_login, callback, progress_callback, page, batch))
+
+    async def _download(self, bv: str, is_login: bool, callback=None,
+                        progress_callback=None, page: Optional[int] = None,
+                        batch: Optional[BatchMetrics] = None) -> bool:
+        """在引擎事件循环中执行单个下载"""
+        metrics = self.metrics
+        active = False
+        started = None
         try:
+            # 全局限速：所有下载共享启动BBDown进程的令牌
+            waited = await self.spawn_limiter.acquire_async()
+            metrics.observe("limiter_wait", waited, batch)
+            if waited > 0:
+                self.logger.log_to_file(f"{bv} 等待限速 {waited:.1f} 秒")
+
             # 构建命令
-            cmd = self.command_builder.build_command(bv, is_login)
-            cmd_str = " ".join(cmd)
-            self.logger.log_to_file(f"执行命令: {cmd_str}")
-            
-            # 执行命令
-            process = self.run_bbdown(cmd_str)
+            cmd = self.command_builder.build_command(bv, is_login, page)
+            self.logger.log_to_file(f"执行命令: {' '.join(cmd)}")
             
             # 读取输出
-            output = []
-            success = False
-            while True:
-                line = process.stdout.readline()
-                if not line and process.poll() is not None:
-                    break
-                if line:
-                    line = line.strip()
-                    output.append(line)
-                    # 只输出到本地日志
-                    self.logger.log_to_file(line)
-                    # 检查是否包含成功标志
-                    if "任务完成" in line:
-                        success = True
-            
-            # 获取返回码
-            return_code = process.poll()
-            
-            # 合并输出
-            full_output = "\n".join(output)
+            # 只保留输出尾部和错误行，内存占用与输出量无关
+            output = OutputTail()
+            parser = BBDownProgressParser(bv)
+            spawned = None
+            first_progress = True
+            stage_bytes = {}  # (分P, 阶段) -> 已下载字节数
+
+            def on_spawn():
+                nonlocal spawned
+                spawned = time.monotonic()
+                metrics.observe("spawn_latency", spawned - started, batch)
+
+            def on_line(line: str):
+                nonlocal first_progress
+                output.append(line)
+                # 只输出到本地日志
+                self.logger.log_to_file(line)
+                # 解析进度（包括"任务完成"成功标志）
+                event = parser.feed(line)
+                if event is None:
+                    return
+                if event.percent is not None and first_progress and spawned is not None:
+                    first_progress = False
+                    metrics.observe("first_progress", time.monotonic() - spawned, batch)
+                if event.downloaded_bytes is not None:
+                    key = (event.page, event.stage)
+                    stage_bytes[key] = max(stage_bytes.get(key, 0), event.downloaded_bytes)
+                if progress_callback:
+                    progress_callback(event)
+
+            # 执行命令并获取返回码（停滞时由看门狗终止，抛出 ProcessStalled）
+            started = time.monotonic()
+            metrics.attempts.inc()
+            metrics.active.inc()
+            active = True
+            return_code = await self.engine.run_process(
+                cmd, on_line, self._create_watchdog(bv), on_spawn)
             
             # 检查是否成功（根据任务完成标志或返回码）
-            if success or return_code == 0:
+            if parser.done or return_code == 0:
+                metrics.add_bytes(sum(stage_bytes.values()), batch)
                 if callback:
                     callback(True)
-            else:
-                if callback:
-                    callback(False, full_output)
-                    
+                return True
+            if callback:
+                callback(False, output.text())
+            return False
+
+        except ProcessStalled as e:
+            self.logger.log_to_file(f"{bv} {e}", LogLevel.ERROR)
+            if callback:
+                callback(False, str(e))
+            return False
         except Exception as e:
             if callback:
                 callback(False, str(e))
+            return False
+        finally:
+            if active:
+                metrics.active.dec()
+                metrics.observe("wall_time", time.monotonic() - started, batch)
+
+    def _create_watchdog(self, bv: str) -> Optional[StallWatchdog]:
+        """按配置创建停滞看门狗，同时监视BBDown在 work_dir/<aid> 中写入的临时文件"""
+        threshold = self.config.stall_timeout
+        if threshold <= 0:
+            return None
+        watch_dir = None
+        if self.config.save_path:
+            try:
+                watch_dir = os.path.join(self.config.save_path, str(bv_to_aid(bv)))
+            except ValueError:
+                pass
+        return StallWatchdog(threshold, watch_dir)
+
+    def download_batch(self, bv_list: Iterable[Union[str, BVJob]], is_login: bool,
+                       callback: Callable[..., None],
+                       max_workers: Optional[int] = None,
+                       progress_callback: Optional[Callable[[ProgressEvent], None]] = None,
+                       start_callback: Optional[Callable[[str], None]] = None):
+        """
+        在进程引擎中并发下载多个视频，阻塞直到全部完成
+
+        Args:
+            bv_list: 待下载的BV号或 BVJob，可以是惰性迭代器（如 iter_jobs 的结果）
+            is_login: 是否已登录
+            callback: 每个任务最终完成后调用 callback(key, success, error_msg=None)，
+                      key 为BV号，分P任务为 BVJob.key，
+                      在引擎线程中被调用，应尽快返回。临时失败会按退避策略自动重试，
+                      只有成功或不再重试时才回调，error_msg 为分类后的失败原因
+            max_workers: 最大并发数，默认使用配置中的 max_concurrency
+            progress_callback: 进度事件回调，通过 event.bv 区分不同视频
+            start_callback: 每个任务启动BBDown进程前调用 start_callback(key)
+        """
+        if max_workers is None:
+            max_workers = self.config.max_concurrency
+        # 同时在引擎中运行的下载数不超过 max_workers，多余的BV留在迭代器中
+        slots = threading.BoundedSemaphore(max(1, max_workers))
+        pending = set()
+        scheduler = RetryScheduler(self.config.max_attempts, self.config.retry_base_delay)
+        retry_queue = RetryQueue()
+        # 指标文件定期导出，本批次结束时另写一份JSON摘要
+        exporter = get_exporter(app_paths.metrics_file)
+        batch = BatchMetrics(max_workers)
+
+        def _on_result(job: BVJob, success: bool, error_msg: str = None):
+            key = job.key
+            if success:
+                self.metrics.record_result("success", batch)
+                callback(key, True, None)
+                return
+            failure = classify_failure(error_msg)
+            delay = scheduler.next_delay(key, failure)
+            if delay is not None:
+                # 临时失败：退避后重新排队
+                self.metrics.record_retry(failure.kind, batch)
+                self.logger.log_to_window(
+                    f"{key} 下载失败（{failure.reason}），{delay:.0f}秒后第{scheduler.attempts(key)}次重试...")
+                retry_queue.push(job, delay)
+            else:
+                if failure.kind is FailureKind.STALLED:
+                    self.metrics.record_stall(batch)
+                self.metrics.record_result("failed", batch)
+                callback(key, False, failure.reason)
+
+        def _on_done(future: Future):
+            with self._lock:
+                self.active_downloads -= 1
+                pending.discard(future)
+            slots.release()
+            retry_queue.notify()
+
+        def _has_pending() -> bool:
+            with self._lock:
+                return bool(pending)
+
+        source = iter(bv_list)
+        source_exhausted = False
+        # 回调出错等异常退出时也导出本批次的指标
+        try:
+            while True:
+                # 到期的重试优先于新任务
+                job = retry_queue.pop_due()
+                if job is None and not source_exhausted:
+                    item = next(source, None)
+                    if item is None:
+                        source_exhausted = True
+                        continue
+                    job = item if isinstance(item, BVJob) else BVJob.from_key(item)
+                    # 无法转换为aid的BV号直接判定失败，不启动BBDown进程
+                    if not is_valid_bv(job.bv):
+                        self.metrics.record_result("invalid", batch)
+                        callback(job.key, False, INVALID_BV_MESSAGE)
+                        continue
+                if job is None:
+                    # 新任务已全部提交，等待进行中的下载和尚未到期的重试
+                    if not _has_pending() and not len(retry_queue):
+                        break
+                    retry_queue.wait()
+                    continue
+
+                slots.acquire()
+                with self._lock:
+                    self.active_downloads += 1
+                self.logger.log_to_file(f"{job.key} 正在处理...")
+                if start_callback:
+                    start_callback(job.key)
+                future = self.submit_download(
+                    job.bv, is_login,
+                    lambda success, error_msg=None, job=job: _on_result(job, success, error_msg),
+                    progress_callback, job.page, batch
+                )
+                with self._lock:
+                    pending.add(future)
+                future.add_done_callback(_on_done)
+        finally:
+            self._finish_batch(batch, exporter)
+
+    def _finish_batch(self, batch: BatchMetrics, exporter):
+        """导出指标文件并写入本批次的JSON摘要"""
+        exporter.write_now()
+        if batch.summary()["jobs"]:
+            path = batch.write(app_paths.metrics_dir)
+            if path:
+                self.logger.log_to_file(f"本批次统计已保存: {path}")
 
     def is_all_complete(self) -> bool:
         with self._lock:
@@ -69,25 +291,20 @@ class VideoDownloader:
 
     def _check_bbdown(self) -> bool:
         try:
-            subprocess.run(["bbdown", "--version"], 
-                         stdout=subprocess.PIPE, 
+            launcher.run(["bbdown", "--version"],
+                         stdout=subprocess.PIPE,
                          stderr=subprocess.PIPE)
             return True
         except FileNotFoundError:
             return False
 
-    def run_bbdown(self, command):
-        """Run BBDown with hidden console window"""
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = subprocess.SW_HIDE
-        
-        process = subprocess.Popen(
+    def run_bbdown(self, command: List[str]):
+        """直接启动BBDown（不经过shell，Windows下隐藏控制台窗口）"""
+        return launcher.popen(
             command,
-            shell=True,
-            startupinfo=startupinfo,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding=self.system_encoding,
+            errors="replace"
         )
-        return process
\ No newline at end of file
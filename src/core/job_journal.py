@@ -0,0 +1,149 @@
+import sqlite3
+import threading
+import time
+from enum import Enum
+from queue import Queue, Empty
+from typing import Iterable, List, Optional
+
+
+class JobState(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    bv TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    reason TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state);
+"""
+
+# 重新提交的任务回到排队状态，但保留最初的创建时间（决定恢复顺序）
+_UPSERT_SQL = """
+INSERT INTO jobs (bv, state, reason, created_at, updated_at) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(bv) DO UPDATE SET
+    state = excluded.state, reason = excluded.reason, updated_at = excluded.updated_at
+"""
+
+
+class JobJournal:
+    """
+    基于SQLite（WAL模式）的持久化下载任务日志
+
+    记录每个BV号的状态（排队/下载中/完成/失败）、失败原因和时间戳，
+    程序崩溃或被关闭后可以恢复未完成的任务。
+    状态变更先进入内存队列，由后台线程按批写入，不会拖慢下载线程。
+    """
+
+    def __init__(self, db_path: str, flush_interval: float = 0.5, batch_size: int = 500):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = Queue()
+        self._closed = False
+
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name="job-journal", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL模式下NORMAL同步已能保证崩溃后数据库一致
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    self._queue.task_done()
+                    break
+                batch = [item]
+                # 在一个刷新周期内尽量攒批，一次事务写入
+                deadline = time.monotonic() + self.flush_interval
+                stop = False
+                while len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                try:
+                    with conn:
+                        conn.executemany(_UPSERT_SQL, batch)
+                except sqlite3.Error as e:
+                    print(f"写入任务日志失败: {e}")
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._queue.task_done()
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _record(self, bv: str, state: JobState, reason: Optional[str] = None):
+        if self._closed:
+            return
+        now = time.time()
+        self._queue.put((bv, state.value, reason, now, now))
+
+    def enqueue(self, bv_list: Iterable[str]):
+        """记录新提交的任务"""
+        for bv in bv_list:
+            self._record(bv, JobState.QUEUED)
+
+    def mark_running(self, bv: str):
+        """记录任务开始下载"""
+        self._record(bv, JobState.RUNNING)
+
+    def mark_done(self, bv: str):
+        """记录任务完成（包括已下载过而跳过的任务）"""
+        self._record(bv, JobState.DONE)
+
+    def mark_failed(self, bv: str, reason: Optional[str] = None):
+        """记录任务失败及原因"""
+        self._record(bv, JobState.FAILED, reason)
+
+    def flush(self):
+        """等待所有已提交的状态变更写入数据库"""
+        self._queue.join()
+
+    def unfinished(self) -> List[str]:
+        """获取未完成（排队中或下载中断）的任务，按提交顺序排列"""
+        self.flush()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT bv FROM jobs WHERE state IN (?, ?) ORDER BY created_at, rowid",
+                (JobState.QUEUED.value, JobState.RUNNING.value)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [row[0] for row in rows]
+
+    def close(self):
+        """写完剩余的状态变更并停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=5)
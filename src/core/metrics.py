@@ -0,0 +1,360 @@
+import bisect
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from .retry import FailureKind
+
+# 秒级耗时的默认分桶
+DEFAULT_TIME_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: _LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[_LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, labels: Optional[Dict[str, str]] = None):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, labels: Optional[Dict[str, str]] = None) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in items]
+
+    def snapshot(self):
+        with self._lock:
+            return {_format_labels(key) or "": value for key, value in self._values.items()}
+
+
+class Gauge(Counter):
+    """可增可减的当前值"""
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, labels: Optional[Dict[str, str]] = None):
+        self.inc(-amount, labels)
+
+    def set(self, value: float, labels: Optional[Dict[str, str]] = None):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram(_Metric):
+    """按分桶统计的观测值分布"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_TIME_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签: [各分桶计数..., 总和, 总数]
+        self._values: Dict[_LabelKey, List[float]] = {}
+
+    def observe(self, value: float, labels: Optional[Dict[str, str]] = None):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(data)) for key, data in self._values.items())
+        lines = []
+        for key, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', _format_value(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {int(data[-1])}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(data[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {int(data[-1])}")
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            return {_format_labels(key) or "": {"count": int(data[-1]), "sum": data[-2]}
+                    for key, data in self._values.items()}
+
+
+class MetricsRegistry:
+    """指标注册表，同名指标只创建一次"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {name} 已注册为 {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str,
+                  buckets: Iterable[float] = DEFAULT_TIME_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, buckets)
+
+    def render_prometheus(self) -> str:
+        """生成Prometheus文本格式"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+def write_text_atomic(path: str, text: str):
+    """写入临时文件后替换，读取方不会看到写了一半的文件"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".metrics-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class MetricsExporter:
+    """后台线程定期把注册表写成Prometheus文本文件（供node_exporter的textfile收集器读取）"""
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval: float = 15.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.write_now()
+
+    def write_now(self):
+        try:
+            write_text_atomic(self.path, self.registry.render_prometheus())
+        except OSError as e:
+            print(f"写入指标文件失败: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write_now()
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(math.ceil(q * len(ordered))) - 1))
+    return round(ordered[index], 3)
+
+
+class BatchMetrics:
+    """单个批次的统计，批次结束时写成JSON摘要"""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self.counts = {"success": 0, "failed": 0, "invalid": 0, "retries": 0, "stalls": 0}
+        self.bytes_downloaded = 0
+        self.timings: Dict[str, List[float]] = {
+            "limiter_wait": [], "spawn_latency": [], "first_progress": [], "wall_time": []
+        }
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.timings.setdefault(name, []).append(value)
+
+    def add_bytes(self, amount: int):
+        with self._lock:
+            self.bytes_downloaded += amount
+
+    def summary(self) -> dict:
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            finished = self.counts["success"] + self.counts["failed"] + self.counts["invalid"]
+            return {
+                "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+                "elapsed": round(elapsed, 3),
+                "max_workers": self.max_workers,
+                "jobs": finished,
+                **self.counts,
+                "failure_rate": round((self.counts["failed"] + self.counts["invalid"]) / finished, 4) if finished else 0.0,
+                "jobs_per_sec": round(finished / elapsed, 3) if elapsed > 0 else 0.0,
+                "bytes_downloaded": self.bytes_downloaded,
+                "bytes_per_sec": round(self.bytes_downloaded / elapsed, 1) if elapsed > 0 else 0.0,
+                "timings": {
+                    name: {"count": len(values), "p50": _percentile(values, 0.5),
+                           "p95": _percentile(values, 0.95), "max": _percentile(values, 1.0)}
+                    for name, values in self.timings.items()
+                },
+            }
+
+    def write(self, directory: str) -> Optional[str]:
+        """把摘要写入 directory/batch_<时间>.json，返回文件路径"""
+        timestamp = f"{datetime.fromtimestamp(self.started_at):%Y%m%d_%H%M%S}"
+        path = os.path.join(directory, f"batch_{timestamp}.json")
+        # 同一秒内开始的多个批次避免覆盖之前的文件
+        index = 1
+        while os.path.exists(path):
+            path = os.path.join(directory, f"batch_{timestamp}_{index}.json")
+            index += 1
+        try:
+            write_text_atomic(path, json.dumps(self.summary(), ensure_ascii=False, indent=2))
+            return path
+        except OSError as e:
+            print(f"写入批次统计失败: {e}")
+            return None
+
+
+# 进程内共用的注册表
+registry = MetricsRegistry()
+
+
+class DownloadMetrics:
+    """下载器使用的指标，batch 不为空时同时计入该批次的统计"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.downloads = registry.counter("bvdownloader_downloads_total", "下载任务的最终结果数")
+        self.attempts = registry.counter("bvdownloader_attempts_total", "启动BBDown进程的次数")
+        self.retries = registry.counter("bvdownloader_retries_total", "临时失败后安排的重试次数（按失败类型）")
+        self.stalls = registry.counter("bvdownloader_stalls_total", "因停滞被终止的BBDown进程数")
+        self.bytes = registry.counter("bvdownloader_downloaded_bytes_total", "成功下载的字节数")
+        self.active = registry.gauge("bvdownloader_active_downloads", "正在运行的BBDown进程数")
+        self.limiter_wait = registry.histogram("bvdownloader_limiter_wait_seconds", "等待启动限速的时间")
+        self.spawn_latency = registry.histogram("bvdownloader_spawn_latency_seconds", "启动BBDown进程的耗时")
+        self.first_progress = registry.histogram("bvdownloader_first_progress_seconds", "进程启动到第一条进度输出的时间")
+        self.wall_time = registry.histogram("bvdownloader_download_seconds", "单次下载（一个进程）的总耗时")
+
+    def observe(self, name: str, value: float, batch: Optional[BatchMetrics] = None):
+        getattr(self, name).observe(value)
+        if batch is not None:
+            batch.observe(name, value)
+
+    def record_result(self, result: str, batch: Optional[BatchMetrics] = None):
+        self.downloads.inc(labels={"result": result})
+        if batch is not None:
+            batch.count(result)
+
+    def record_retry(self, kind: FailureKind, batch: Optional[BatchMetrics] = None):
+        # 标签只用固定的失败类型，具体原因（含BBDown输出）只写入日志
+        self.retries.inc(labels={"kind": kind.value})
+        if batch is not None:
+            batch.count("retries")
+        if kind is FailureKind.STALLED:
+            self.record_stall(batch)
+
+    def record_stall(self, batch: Optional[BatchMetrics] = None):
+        self.stalls.inc()
+        if batch is not None:
+            batch.count("stalls")
+
+    def add_bytes(self, amount: int, batch: Optional[BatchMetrics] = None):
+        self.bytes.inc(amount)
+        if batch is not None:
+            batch.add_bytes(amount)
+
+
+_exporter: Optional[MetricsExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter(path: str, interval: float = 15.0) -> MetricsExporter:
+    """获取（必要时启动）全局指标导出线程"""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = MetricsExporter(registry, path, interval)
+        _exporter.start()
+        return _exporter
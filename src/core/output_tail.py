@@ -0,0 +1,49 @@
+import re
+from collections import deque
+from typing import Pattern
+
+# 匹配BBDown输出中可能说明失败原因的行
+DEFAULT_ERROR_PATTERN = re.compile(
+    r"error|exception|fail|timeout|must to be|错误|失败|异常|未找到|超时|尚未登录|未登录",
+    re.IGNORECASE
+)
+
+
+class OutputTail:
+    """
+    BBDown输出的定长尾部缓冲
+
+    只保留最后 max_lines 行，以及最近 max_error_lines 条匹配错误模式的行，
+    无论进程输出多少内容，每个下载占用的内存都是固定的。
+    """
+
+    def __init__(self, max_lines: int = 50, max_error_lines: int = 20,
+                 error_pattern: Pattern = DEFAULT_ERROR_PATTERN):
+        self.error_pattern = error_pattern
+        self._tail = deque(maxlen=max_lines)
+        self._errors = deque(maxlen=max_error_lines)
+        self._seq = 0
+        self.total_lines = 0
+
+    def append(self, line: str):
+        """追加一行输出"""
+        self._seq += 1
+        self.total_lines += 1
+        entry = (self._seq, line)
+        self._tail.append(entry)
+        if self.error_pattern.search(line):
+            self._errors.append(entry)
+
+    def lines(self):
+        """按原始顺序返回保留的行（错误行在前面被挤出尾部时仍然保留）"""
+        merged = {seq: line for seq, line in self._errors}
+        merged.update(self._tail)
+        return [merged[seq] for seq in sorted(merged)]
+
+    def text(self) -> str:
+        """合并为文本，用于失败原因"""
+        lines = self.lines()
+        if lines and self.total_lines > len(lines):
+            # 标记中间被丢弃的输出
+            lines.insert(0, f"...（省略 {self.total_lines - len(lines)} 行输出）")
+        return "\n".join(lines)
@@ -0,0 +1,143 @@
+import re
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+
+_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+# 形如 "10.00 MB" / "512KiB" 的大小
+_SIZE = r"(\d+(?:\.\d+)?)\s*([KMGT]?)i?B"
+_PERCENT_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)\s*%")
+_SIZES_RE = re.compile(_SIZE + r"\s*/\s*" + _SIZE, re.IGNORECASE)
+_SPEED_RE = re.compile(_SIZE + r"\s*/\s*s\b", re.IGNORECASE)
+_PAGE_RE = re.compile(r"P(\d+)")
+
+
+class ProgressStage(Enum):
+    PARSING = "解析"
+    VIDEO = "视频"
+    AUDIO = "音频"
+    DANMAKU = "弹幕"
+    SUBTITLE = "字幕"
+    MUXING = "合并"
+    DONE = "完成"
+
+
+# 按顺序匹配，先匹配到的阶段优先
+_STAGE_KEYWORDS = [
+    ("任务完成", ProgressStage.DONE),
+    ("混流", ProgressStage.MUXING),
+    ("合并", ProgressStage.MUXING),
+    ("视频", ProgressStage.VIDEO),
+    ("音频", ProgressStage.AUDIO),
+    ("弹幕", ProgressStage.DANMAKU),
+    ("字幕", ProgressStage.SUBTITLE),
+    ("解析", ProgressStage.PARSING),
+    ("获取aid", ProgressStage.PARSING),
+]
+
+
+def parse_size(value: str, unit: str) -> int:
+    """把数值和单位（K/M/G/T）换算为字节数"""
+    return int(float(value) * _UNITS.get(unit.upper(), 1))
+
+
+def format_size(num_bytes: Optional[float]) -> str:
+    """把字节数格式化为可读字符串"""
+    if num_bytes is None:
+        return "-"
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f} {unit}" if unit != "B" else f"{int(num_bytes)} B"
+        num_bytes /= 1024
+    return f"{num_bytes:.2f} TB"
+
+
+@dataclass
+class ProgressEvent:
+    """BBDown下载进度事件"""
+    bv: str
+    stage: ProgressStage
+    page: Optional[int] = None
+    percent: Optional[float] = None
+    downloaded_bytes: Optional[int] = None
+    total_bytes: Optional[int] = None
+    speed: Optional[float] = None  # 字节/秒
+    eta: Optional[float] = None  # 秒
+
+    def describe(self) -> str:
+        """生成一行适合显示的进度描述"""
+        parts = [self.bv]
+        if self.page is not None:
+            parts.append(f"P{self.page}")
+        parts.append(self.stage.value)
+        if self.percent is not None:
+            parts.append(f"{self.percent:.1f}%")
+        if self.total_bytes is not None:
+            parts.append(f"{format_size(self.downloaded_bytes)}/{format_size(self.total_bytes)}")
+        if self.speed is not None:
+            parts.append(f"{format_size(self.speed)}/s")
+        if self.eta is not None:
+            parts.append(f"剩余 {int(self.eta)}s")
+        return " ".join(parts)
+
+
+class BBDownProgressParser:
+    """
+    流式解析BBDown输出，把文本行转换为进度事件
+
+    每行只解析一次、不保留原始行；进度条事件按 min_interval 节流，
+    阶段变化和100%总会立即产生事件。
+    """
+
+    def __init__(self, bv: str, min_interval: float = 0.5):
+        self.bv = bv
+        self.min_interval = min_interval
+        self.stage = ProgressStage.PARSING
+        self.page: Optional[int] = None
+        self.done = False
+        self._last_emit = 0.0
+
+    def feed(self, line: str) -> Optional[ProgressEvent]:
+        """解析一行输出，返回进度事件或None"""
+        percent_match = _PERCENT_RE.search(line)
+        if percent_match:
+            return self._parse_progress(line, float(percent_match.group(1)))
+
+        for keyword, stage in _STAGE_KEYWORDS:
+            if keyword in line:
+                page_match = _PAGE_RE.search(line)
+                if page_match:
+                    self.page = int(page_match.group(1))
+                self.stage = stage
+                if stage is ProgressStage.DONE:
+                    self.done = True
+                self._last_emit = time.monotonic()
+                return ProgressEvent(self.bv, stage, self.page)
+        return None
+
+    def _parse_progress(self, line: str, percent: float) -> Optional[ProgressEvent]:
+        now = time.monotonic()
+        if percent < 100 and now - self._last_emit < self.min_interval:
+            return None
+        self._last_emit = now
+
+        event = ProgressEvent(self.bv, self.stage, self.page, percent=min(percent, 100.0))
+        sizes = _SIZES_RE.search(line)
+        if sizes:
+            event.downloaded_bytes = parse_size(sizes.group(1), sizes.group(2))
+            event.total_bytes = parse_size(sizes.group(3), sizes.group(4))
+        speed = _SPEED_RE.search(line)
+        if speed:
+            event.speed = float(parse_size(speed.group(1), speed.group(2)))
+        if event.speed:
+            if event.total_bytes is not None and event.downloaded_bytes is not None:
+                remaining = event.total_bytes - event.downloaded_bytes
+            elif event.total_bytes is not None:
+                remaining = event.total_bytes * (100 - event.percent) / 100
+            else:
+                remaining = None
+            if remaining is not None:
+                event.eta = max(0.0, remaining / event.speed)
+        return event
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶限速器
+
+    以 rate 个/秒的速度补充令牌，最多积累 burst 个；rate <= 0 表示不限速。
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self._lock = threading.Lock()
+        self.rate = 0.0
+        self.burst = 1
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.configure(rate, burst)
+        self._tokens = float(self.burst)  # 初始为满桶，允许启动时突发
+
+    def configure(self, rate: float, burst: int):
+        """修改速率和桶容量，已积累的令牌不超过新容量"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(0.0, float(rate))
+            self.burst = max(1, int(burst))
+            if self.rate <= 0:
+                self._tokens = float(self.burst)
+            self._tokens = min(self._tokens, float(self.burst))
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """尝试取出令牌：成功返回0，否则返回还需等待的秒数（不消耗令牌）"""
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """当前取出令牌需要等待的秒数"""
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            self._refill(time.monotonic())
+            return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def acquire(self, tokens: float = 1) -> float:
+        """阻塞直到取得令牌，返回实际等待的秒数"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, tokens: float = 1) -> float:
+        """在事件循环中等待令牌，返回实际等待的秒数"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+
+# 进程内所有下载共用一个限速器
+_spawn_limiter: Optional[TokenBucket] = None
+_spawn_limiter_lock = threading.Lock()
+
+
+def get_spawn_limiter(rate: float, burst: int) -> TokenBucket:
+    """获取全局的BBDown进程启动限速器，参数变化时就地更新"""
+    global _spawn_limiter
+    with _spawn_limiter_lock:
+        if _spawn_limiter is None:
+            _spawn_limiter = TokenBucket(rate, burst)
+        elif _spawn_limiter.rate != max(0.0, float(rate)) or _spawn_limiter.burst != max(1, int(burst)):
+            _spawn_limiter.configure(rate, burst)
+        return _spawn_limiter
@@ -0,0 +1,132 @@
+import heapq
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, Optional
+from .bvid import INVALID_BV_MESSAGE
+from .bv_extractor import BVJob
+
+
+class FailureKind(Enum):
+    TRANSIENT = "transient"  # 网络、限流、超时等，可以重试
+    PERMANENT = "permanent"  # 视频被删除、BV号无效等，重试没有意义
+    STALLED = "stalled"  # 进程长时间无输出无写入被看门狗终止，可以重试
+
+
+@dataclass
+class FailureInfo:
+    """下载失败的分类结果"""
+    kind: FailureKind
+    reason: str
+
+    @property
+    def retryable(self) -> bool:
+        return self.kind is not FailureKind.PERMANENT
+
+
+# 按顺序匹配，先匹配到的规则优先
+_FAILURE_RULES = [
+    (re.compile(r"下载停滞"), FailureKind.STALLED, "下载停滞"),
+    (re.compile(re.escape(INVALID_BV_MESSAGE)), FailureKind.PERMANENT, INVALID_BV_MESSAGE),
+    (re.compile(r"must to be 12 char"), FailureKind.PERMANENT, "BV号长度不正确"),
+    (re.compile(r"未找到此|视频不见了|稿件不可见|已失效|\b-?404\b"), FailureKind.PERMANENT, "原视频已被删除。"),
+    (re.compile(r"强制登录|尚未登录|需要登录|大会员"), FailureKind.PERMANENT, "需要登录或大会员权限"),
+    (re.compile(r"-412|\b412\b|\b429\b|频繁|rate.?limit|too many requests", re.IGNORECASE),
+     FailureKind.TRANSIENT, "请求过于频繁"),
+    (re.compile(r"timed? ?out|timeout|超时", re.IGNORECASE), FailureKind.TRANSIENT, "网络超时"),
+    (re.compile(r"network|connection|socket|httprequest|ssl|reset|unreachable|网络|连接", re.IGNORECASE),
+     FailureKind.TRANSIENT, "网络错误"),
+]
+
+_DETAIL_PATTERN = re.compile(r"error|exception|错误|失败|异常", re.IGNORECASE)
+
+
+def classify_failure(error_text: Optional[str]) -> FailureInfo:
+    """根据BBDown输出或异常信息判断失败类型"""
+    text = error_text or ""
+    for pattern, kind, reason in _FAILURE_RULES:
+        if pattern.search(text):
+            return FailureInfo(kind, reason)
+
+    # 无法识别的失败按临时失败处理（受重试次数上限约束），附上最后一条错误信息
+    detail = ""
+    for line in reversed(text.splitlines()):
+        if _DETAIL_PATTERN.search(line):
+            detail = line.strip()[:80]
+            break
+    return FailureInfo(FailureKind.TRANSIENT, f"其他原因: {detail}" if detail else "其他原因")
+
+
+class RetryScheduler:
+    """
+    重试调度器
+
+    记录每个BV号的失败次数，只对临时失败在次数上限内安排重试，
+    延迟为带随机抖动的指数退避：base_delay * 2^(n-1) * [1-jitter, 1+jitter]。
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 5.0,
+                 max_delay: float = 300.0, jitter: float = 0.5):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def attempts(self, bv: str) -> int:
+        """已失败的次数"""
+        with self._lock:
+            return self._attempts.get(bv, 0)
+
+    def next_delay(self, bv: str, failure: FailureInfo) -> Optional[float]:
+        """记录一次失败，返回下次重试前的等待秒数；不应重试时返回None"""
+        with self._lock:
+            attempts = self._attempts.get(bv, 0) + 1
+            self._attempts[bv] = attempts
+        if not failure.retryable or attempts >= self.max_attempts:
+            return None
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class RetryQueue:
+    """按到期时间排序的线程安全重试队列（元素为 BVJob）"""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def push(self, job: BVJob, delay: float):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, job))
+            self._cond.notify_all()
+
+    def pop_due(self) -> Optional[BVJob]:
+        """取出一个已到期的任务，没有则返回None"""
+        with self._cond:
+            if self._heap and self._heap[0][0] <= time.monotonic():
+                return heapq.heappop(self._heap)[2]
+            return None
+
+    def wait(self, max_timeout: float = 1.0):
+        """等待到下一个重试到期，或被 notify 唤醒"""
+        with self._cond:
+            timeout = max_timeout
+            if self._heap:
+                timeout = min(timeout, max(0.0, self._heap[0][0] - time.monotonic()))
+            if timeout > 0:
+                self._cond.wait(timeout)
+
+    def notify(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._heap)
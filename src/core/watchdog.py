@@ -0,0 +1,113 @@
+import asyncio
+import os
+import time
+from typing import Optional, Tuple
+
+
+class ProcessStalled(Exception):
+    """进程长时间没有输出也没有写入文件，已被看门狗终止"""
+
+    def __init__(self, idle_seconds: float):
+        super().__init__(f"下载停滞：{idle_seconds:.0f}秒没有输出也没有写入文件，已终止BBDown")
+        self.idle_seconds = idle_seconds
+
+
+def _dir_signature(path: str) -> Optional[Tuple[int, int]]:
+    """目录（含子目录）中文件的总大小和最新修改时间，目录不存在时返回None"""
+    total_size = 0
+    latest_mtime = 0
+    stack = [path]
+    found = False
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        found = True
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        st = entry.stat(follow_symlinks=False)
+                        total_size += st.st_size
+                        latest_mtime = max(latest_mtime, st.st_mtime_ns)
+                except OSError:
+                    continue
+    return (total_size, latest_mtime) if found else None
+
+
+class StallWatchdog:
+    """
+    单个BBDown进程的停滞看门狗
+
+    记录最后一行输出的时间；输出静默时再检查下载目录（BBDown在 work_dir/<aid> 中写临时文件）
+    是否仍有数据写入。两者都超过 threshold 秒没有变化时先 terminate，
+    grace 秒后仍未退出则 kill。
+    """
+
+    def __init__(self, threshold: float, watch_dir: Optional[str] = None,
+                 grace: float = 5.0, check_interval: Optional[float] = None):
+        self.threshold = threshold
+        self.watch_dir = watch_dir
+        self.grace = grace
+        self.check_interval = check_interval or max(1.0, min(threshold / 4, 10.0))
+        self.last_activity = time.monotonic()
+        self.stalled_for: Optional[float] = None
+        self._dir_signature = None
+
+    @property
+    def stalled(self) -> bool:
+        return self.stalled_for is not None
+
+    def touch(self):
+        """收到一行输出"""
+        self.last_activity = time.monotonic()
+
+    def _check_dir(self):
+        """下载目录有新数据时视为活动"""
+        if not self.watch_dir:
+            return
+        signature = _dir_signature(self.watch_dir)
+        if signature is not None and signature != self._dir_signature:
+            self._dir_signature = signature
+            self.last_activity = time.monotonic()
+
+    async def guard(self, process: asyncio.subprocess.Process,
+                    reader: Optional[asyncio.Future] = None):
+        """
+        监视进程直到其退出，停滞时终止进程（作为任务与读取输出并行运行）
+
+        reader 为读取输出的任务，停滞时将其取消
+        """
+        loop = asyncio.get_running_loop()
+        if self.watch_dir:
+            # 先记录目录的初始状态，否则第一次扫描总会被当作活动
+            self._dir_signature = await loop.run_in_executor(None, _dir_signature, self.watch_dir)
+        while process.returncode is None:
+            await asyncio.sleep(self.check_interval)
+            idle = time.monotonic() - self.last_activity
+            if idle < self.check_interval:
+                continue
+            # 只有输出静默时才扫描目录
+            await loop.run_in_executor(None, self._check_dir)
+            idle = time.monotonic() - self.last_activity
+            if idle < self.threshold or process.returncode is not None:
+                continue
+
+            self.stalled_for = idle
+            try:
+                process.terminate()
+                # process.wait() 还会等待输出管道关闭，这里只看进程本身是否已退出
+                deadline = time.monotonic() + self.grace
+                while process.returncode is None and time.monotonic() < deadline:
+                    await asyncio.sleep(0.1)
+                if process.returncode is None:
+                    process.kill()
+            except ProcessLookupError:
+                pass
+            # BBDown的子进程（如ffmpeg）可能仍持有输出管道，不等待EOF，直接停止读取
+            if reader is not None:
+                reader.cancel()
+            return
@@ -1,4 +1,6 @@
+import threading
 import tkinter as tk
+from collections import deque
 from tkinter import scrolledtext
 
 class LogTextArea(scrolledtext.ScrolledText):
@@ -14,6 +16,94 @@ class LogTextArea(scrolledtext.ScrolledText):
         self.see(tk.END)
         self.config(state=tk.DISABLED)
 
+class LogRenderer:
+    """
+    批量日志渲染器
+
+    工作线程只把日志放进待显示队列，每帧（默认约30Hz）统一插入一次：
+    相同标签的连续行合并成一段，整批只切换一次控件状态、只滚动一次。
+    积压超过 max_pending 行时丢弃最早的行（日志文件中仍有完整内容），并在窗口中提示。
+    """
+
+    def __init__(self, text: tk.Text, max_lines: int = 1000, interval_ms: int = 33,
+                 max_pending: int = None, post=None):
+        self.text = text
+        # 在Tk主线程执行函数的方法（如 UIDispatcher.post），为空时直接调用 after
+        self.post = post
+        self.max_lines = max_lines
+        self.interval_ms = interval_ms
+        self.max_pending = max_pending or max_lines
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._dropped = 0  # 本帧丢弃的行数
+        # 累计统计
+        self.frames = 0
+        self.rendered_lines = 0
+        self.merged_lines = 0
+        self.dropped_lines = 0
+
+    def append(self, message: str, tag: str = "info"):
+        """添加一行日志（可在任意线程调用）"""
+        with self._lock:
+            self._pending.append((message, tag))
+            if len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                self._dropped += 1
+            if self._scheduled:
+                return
+            self._scheduled = True
+        if self.post is not None:
+            self.post(self.text.after, self.interval_ms, self.flush)
+        else:
+            self.text.after(self.interval_ms, self.flush)
+
+    def flush(self):
+        """把积压的日志一次性插入控件（在Tk主线程调用）"""
+        with self._lock:
+            lines, self._pending = self._pending, deque()
+            dropped, self._dropped = self._dropped, 0
+            self._scheduled = False
+        if not lines and not dropped:
+            return
+
+        # 相同标签的连续行合并为一段: insert(index, text1, tag1, text2, tag2, ...)
+        segments = []
+        if dropped:
+            segments.append([f"...（日志过多，省略了 {dropped} 行，完整内容见日志文件）\n", "info"])
+        for message, tag in lines:
+            if segments and segments[-1][1] == tag:
+                segments[-1][0] += message + "\n"
+            else:
+                segments.append([message + "\n", tag])
+        args = []
+        for chunk, tag in segments:
+            args.extend((chunk, tag))
+
+        self.frames += 1
+        self.rendered_lines += len(lines)
+        self.merged_lines += len(lines) - len(segments) + (1 if dropped else 0)
+        self.dropped_lines += dropped
+
+        self.text.config(state=tk.NORMAL)
+        self.text.insert(tk.END, *args)
+        self._trim()
+        self.text.see(tk.END)
+        self.text.config(state=tk.DISABLED)
+
+    def _trim(self):
+        """超过 max_lines 行时删除最早的内容"""
+        line_count = int(self.text.index("end-1c").split(".")[0])
+        # 多删十分之一，避免每帧都删除
+        if line_count > self.max_lines + self.max_lines // 10:
+            self.text.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+
+    def stats(self) -> str:
+        """渲染统计"""
+        return (f"日志渲染: {self.frames} 帧, {self.rendered_lines} 行, "
+                f"合并 {self.merged_lines} 行, 丢弃 {self.dropped_lines} 行")
+
+
 class DownloadButton(tk.Button):
     """下载按钮组件"""
     def __init__(self, master, **kwargs):
@@ -0,0 +1,80 @@
+import queue
+import threading
+import tkinter as tk
+from typing import Callable, Dict, Hashable, Optional
+
+
+class UIDispatcher:
+    """
+    线程安全的UI任务分发器
+
+    工作线程调用 post() 把函数放进队列，再用 event_generate 发送虚拟事件唤醒Tk主循环，
+    主线程收到事件后依次执行队列中的所有函数。空闲时不轮询、不占用CPU，
+    在第一个虚拟事件被处理前继续投递的任务不会重复发送事件。
+    """
+
+    EVENT = "<<UIDispatch>>"
+
+    def __init__(self, widget: tk.Misc):
+        self.widget = widget
+        self._queue = queue.SimpleQueue()
+        self._latest: Dict[Hashable, Callable] = {}  # 按key合并的任务，只保留最新的
+        self._lock = threading.Lock()
+        self._signaled = False
+        self._closed = False
+        widget.bind(self.EVENT, self._drain, add="+")
+        # 主循环启动前投递的任务可能无法发送事件，主循环空闲时先执行一次
+        widget.after_idle(self._drain)
+
+    def post(self, func: Callable, *args, key: Optional[Hashable] = None):
+        """
+        在Tk主线程中执行 func(*args)
+
+        指定 key 时，同一key尚未执行的旧任务会被新任务替换（用于进度显示等只需最新值的更新）
+        """
+        if self._closed:
+            return
+        with self._lock:
+            if key is None:
+                self._queue.put((func, args))
+            else:
+                if key not in self._latest:
+                    self._queue.put((key, None))
+                self._latest[key] = (func, args)
+            if self._signaled:
+                return
+            self._signaled = True
+        try:
+            self.widget.event_generate(self.EVENT, when="tail")
+        except tk.TclError:
+            # 窗口已销毁
+            self._closed = True
+        except RuntimeError:
+            # 主循环尚未运行（如启动时的后台线程），任务留在队列中，由下次投递或空闲时执行
+            with self._lock:
+                self._signaled = False
+
+    def call_later(self, delay_ms: int, func: Callable, *args):
+        """在Tk主线程中延迟执行（可在任意线程调用）"""
+        self.post(self.widget.after, delay_ms, func, *args)
+
+    def close(self):
+        """停止分发，之后投递的任务会被忽略"""
+        self._closed = True
+
+    def _drain(self, event=None):
+        with self._lock:
+            self._signaled = False
+        while True:
+            try:
+                func, args = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if args is None:
+                # 合并任务，func 为key
+                with self._lock:
+                    func, args = self._latest.pop(func)
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"UI更新出错: {e}")
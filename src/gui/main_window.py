@@ -4,10 +4,17 @@ import threading
 import os
 import time
 import subprocess
+from pathlib import Path
 from ..core.downloader import VideoDownloader
+from ..core.progress import ProgressEvent
+from ..core.bv_extractor import BVJob, iter_jobs_from_file
 from ..utils.logger import VideoLogger
 from ..utils.config import Config
-from queue import Queue, Empty
+from ..utils.paths import app_paths
+from ..core.job_journal import JobJournal
+from .components import LogRenderer
+from .dispatcher import UIDispatcher
+from queue import Queue
 from ..utils.logger import LogLevel
 
 class BilibiliDownloaderGUI:
@@ -26,20 +33,21 @@ class BilibiliDownloaderGUI:
         
         # 初始化窗口组件
         self.config = Config()
-        self.logger = VideoLogger()
+        self.logger = VideoLogger(max_window_logs=self.config.window_log_limit)
         self.downloader = VideoDownloader(self.logger)
+        # 持久化任务日志，用于崩溃或关闭后恢复未完成的任务
+        app_paths.ensure_directories()
+        self.journal = JobJournal(app_paths.job_journal_path)
         
-        # 添加任务队列
+        # 添加任务队列（元素为输入文本，或恢复的BV号列表）
         self.task_queue = Queue()
         # 添加下载线程
         self.download_thread = None
         # CD状态
         self.download_cooldown = False
         
-        # 添加UI更新队列
-        self.ui_update_queue = Queue()
-        # 启动UI更新处理器
-        self._start_ui_updater()
+        # 工作线程通过分发器在主线程更新UI（有任务时才唤醒事件循环）
+        self.dispatcher = UIDispatcher(self.root)
 
         self._init_ui()
         # 启动任务处理线程
@@ -62,27 +70,36 @@ class BilibiliDownloaderGUI:
         # 添加日志文件路径
         self.log_file = "bilibili_downloader.log"
 
+        # 关闭窗口时写完任务日志
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+
         # 程序启动时检查登录状态
         self.logger.log_to_file("准备检查登录状态...", LogLevel.INFO)
+        # 检查完成后（BBDown路径已同步）恢复上次未完成的任务
         self.check_login_status_on_start()
 
-    def _start_ui_updater(self):
-        """启动UI更新处理器"""
-        def process_ui_updates():
-            try:
-                while True:
-                    # 检查队列中的更新请求
-                    update_func = self.ui_update_queue.get_nowait()
-                    update_func()
-            except Empty:
-                # 队列为空时，等待100ms后再次检查
-                self.root.after(100, process_ui_updates)
-                
-        self.root.after(100, process_ui_updates)
-
-    def update_ui(self, update_func):
-        """安全地更新UI"""
-        self.ui_update_queue.put(update_func)
+    def _resume_unfinished_jobs(self):
+        """把任务日志中未完成的BV号重新加入任务队列"""
+        try:
+            unfinished = self.journal.unfinished()
+        except Exception as e:
+            self.logger.log_to_file(f"读取任务日志失败: {str(e)}", LogLevel.ERROR)
+            return
+        if unfinished:
+            self.logger.log_to_window(f"发现 {len(unfinished)} 个上次未完成的任务，继续下载...", LogLevel.INFO)
+            self.download_cooldown = True
+            self.task_queue.put(unfinished)
+
+    def _on_close(self):
+        """关闭窗口"""
+        self.dispatcher.close()
+        self.journal.close()
+        self.config.flush()
+        self.root.destroy()
+
+    def update_ui(self, update_func, key=None):
+        """安全地更新UI（可在任意线程调用），指定key时只执行同一key最新的更新"""
+        self.dispatcher.post(update_func, key=key)
 
     def _init_ui(self):
         # 添加登录区域（移到最上面）
@@ -188,13 +205,28 @@ class BilibiliDownloaderGUI:
         self.text_input.pack()
 
     def _create_download_button(self):
+        button_frame = tk.Frame(self.root)
+        button_frame.pack()
+
         self.download_button = tk.Button(
-            self.root,
+            button_frame,
             text="开始下载",
             command=self._handle_download_click,
             state=tk.DISABLED
         )
-        self.download_button.pack()
+        self.download_button.pack(side=tk.LEFT)
+
+        # 超大列表可直接从文件导入，边读边下载
+        import_button = tk.Button(
+            button_frame,
+            text="从文件导入",
+            command=self._handle_import_click
+        )
+        import_button.pack(side=tk.LEFT, padx=(10, 0))
+
+        # 实时下载进度（多个视频并发时显示最近一次更新）
+        self.progress_label = tk.Label(self.root, text="", fg="gray")
+        self.progress_label.pack()
 
     def _create_log_area(self):
         label_output = tk.Label(self.root, text="输出日志：")
@@ -212,27 +244,22 @@ class BilibiliDownloaderGUI:
         self.text_output.tag_configure("error", foreground="red")
         self.text_output.tag_configure("info", foreground="black")
         
+        # 日志按帧批量显示，避免并发下载时大量消息阻塞事件循环
+        self.log_renderer = LogRenderer(self.text_output, max_lines=self.config.log_view_lines,
+                                        post=self.dispatcher.post)
+
         # 注册日志回调
         self.logger.register_callback(self._update_log)
 
     def _update_log(self, message: str, level: LogLevel):
         """更新日志显示"""
-        def _update():
-            self.text_output.config(state=tk.NORMAL)
-            
-            # 根据日志级别选择颜色
-            tag = {
-                LogLevel.SUCCESS: "success",
-                LogLevel.ERROR: "error",
-                LogLevel.INFO: "info"
-            }.get(level, "info")
-            
-            # 插入带颜色的文本
-            self.text_output.insert(tk.END, message + "\n", tag)
-            self.text_output.see(tk.END)
-            self.text_output.config(state=tk.DISABLED)
-            
-        self.root.after(0, _update)
+        # 根据日志级别选择颜色
+        tag = {
+            LogLevel.SUCCESS: "success",
+            LogLevel.ERROR: "error",
+            LogLevel.INFO: "info"
+        }.get(level, "info")
+        self.log_renderer.append(message, tag)
 
     def _on_need_login_changed(self):
         """处理是否需要登录的设置变更"""
@@ -306,6 +333,27 @@ class BilibiliDownloaderGUI:
             self._start_cooldown_timer()
             return
         
+        self._submit_task(input_text)
+
+    def _handle_import_click(self):
+        """处理从文件导入按钮点击：大文件边读边下载，不经过输入框"""
+        if self.download_cooldown:
+            return
+
+        file_path = filedialog.askopenfilename(
+            title="选择包含BV号的文本文件",
+            filetypes=[("文本文件", "*.txt"), ("所有文件", "*.*")]
+        )
+        if not file_path:
+            return
+
+        self.download_cooldown = True
+        self.download_button.config(state=tk.DISABLED)
+        self.logger.log_to_window(f"从文件导入: {file_path}", LogLevel.INFO)
+        self._submit_task(Path(file_path))
+
+    def _submit_task(self, task):
+        """检查登录要求后把下载任务（输入文本或文件路径）加入队列"""
         # 检查登录要求和状态
         if self.config.need_login:
             if not self.config.is_login:
@@ -329,101 +377,124 @@ class BilibiliDownloaderGUI:
         self.text_output.config(state=tk.DISABLED)
         
         # 在开始新的下载任务前重置统计
-        self.logger.success_count = 0
-        self.logger.failed_bvs = []
-        self.logger.failed_reasons = {}
+        self.logger.reset_stats()
         
         # 将下载任务添加到队列
-        self.task_queue.put(input_text)
+        self.task_queue.put(task)
 
     def _start_task_processor(self):
         """启动任务处理线程"""
         def process_tasks():
             while True:
                 try:
-                    input_text = self.task_queue.get()
-                    bv_list = self.downloader.command_builder.extract_valid_bvs(input_text)
+                    task = self.task_queue.get()
+
+                    if isinstance(task, list):
+                        # 恢复的任务已记录在任务日志中
+                        jobs = [BVJob.from_key(key) for key in task]
+                    else:
+                        if isinstance(task, Path):
+                            parsed = iter_jobs_from_file(str(task))
+                        else:
+                            parsed = self.downloader.command_builder.iter_jobs(task)
+                        # 先把解析出的全部任务写入任务日志再开始下载，
+                        # 崩溃时尚未开始的任务也能在下次启动时恢复
+                        jobs = list(parsed)
+                        self.journal.enqueue(job.key for job in jobs)
+                        self.journal.flush()
+                    found = len(jobs)
+
+                    max_workers = self.config.max_concurrency
+                    self.logger.log_to_window(f"共 {found} 个任务，开始下载（并发数 {max_workers}）...", LogLevel.INFO)
                     
-                    if not bv_list:
+                    # 已在BBDown.archives中的BV号直接跳过，不启动进程
+                    new_jobs = self.downloader.filter_downloaded(jobs, self._handle_skipped)
+                    if self._check_force_login(new_jobs):
+                        self.downloader.download_batch(
+                            new_jobs, self.config.is_login,
+                            self._handle_download_result, max_workers,
+                            self._handle_progress, self.journal.mark_running
+                        )
+                    self.update_ui(lambda: self.progress_label.config(text=""), key="progress")
+
+                    if not found:
                         self.logger.log_to_window("错误：未找到有效的BV号！", LogLevel.ERROR)
-                        self.root.after(0, self._start_cooldown_timer)
+                        self.update_ui(self._start_cooldown_timer)
                         continue
-                        
-                    self.logger.log_to_window(f"找到 {len(bv_list)} 个有效BV号，下载中...", LogLevel.INFO)
-                    
-                    for bv in bv_list:
-                        self._download_single_video(bv)
                     
                     # 所有视频处理完成后，显示统计信息
                     self.logger.print_summary()
+                    self.logger.log_to_file(self.log_renderer.stats())
                     
                     # 启动CD
-                    self.root.after(0, self._start_cooldown_timer)
+                    self.update_ui(self._start_cooldown_timer)
                     
                 except Exception as e:
                     self.logger.log_to_window(f"处理任务时出错: {str(e)}", LogLevel.ERROR)
-                    self.root.after(0, self._start_cooldown_timer)
+                    self.update_ui(self._start_cooldown_timer)
                 finally:
                     self.task_queue.task_done()
 
         task_thread = threading.Thread(target=process_tasks, daemon=True)
         task_thread.start()
 
-    def _download_single_video(self, bv: str):
-        """下载单个视频"""
+    def _check_force_login(self, jobs) -> bool:
+        """强制登录但未登录时，将所有任务记为失败并返回False"""
+        if self.need_login_var.get() and not self.config.is_login:
+            error_msg = "你启用了强制登录下载，但当前未登录。请先登录或取消勾选强制登录选项以低画质下载。"
+            for job in jobs:
+                bv = job.key
+                self.logger.log_to_window(f"{bv} 下载失败！{error_msg}", LogLevel.ERROR)
+                self.logger.record_download_result(bv, False, error_msg)
+                self.journal.mark_failed(bv, error_msg)
+            return False
+        return True
+
+    def _handle_skipped(self, bv: str):
+        """记录已下载过而跳过的视频"""
+        self.logger.log_to_window(f"{bv} 已下载过，跳过。", LogLevel.INFO)
+        self.logger.record_skipped(bv)
+        self.journal.mark_done(bv)
+
+    def _handle_progress(self, event: ProgressEvent):
+        """显示实时下载进度（在下载线程中调用）"""
+        text = event.describe()
+        self.update_ui(lambda: self.progress_label.config(text=text), key="progress")
+
+    def _handle_download_result(self, bv: str, success: bool, error_msg: str = None):
+        """处理单个视频的下载结果（在下载工作线程中调用）"""
         try:
-            # 如果启用了强制登录选项，先检查登录状态
-            if self.need_login_var.get():
-                if not self.config.is_login:
-                    error_msg = "你启用了强制登录下载，但当前未登录。请先登录或取消勾选强制登录选项以低画质下载。"
-                    self.logger.log_to_window(f"{bv} 下载失败！{error_msg}", LogLevel.ERROR)
-                    self.logger.record_download_result(bv, False, error_msg)
-                    return
-            
-            event = threading.Event()
-            
-            def callback(success, error_msg=None):
-                if success:
-                    self.logger.log_to_window(f"{bv} 下载成功！", LogLevel.SUCCESS)
-                    self.logger.record_download_result(bv, True)
-                    # 下载成功后更新缓存的BV号
-                    if len(bv) == 12 and bv.startswith('BV'):  # 确保是有效的BV号
-                        self.config.update_cached_bv(bv)
-                else:
-                    # 提取失败原因
-                    if error_msg:
-                        if "must to be 12 char" in error_msg:
-                            error_msg = "BV号长度不正确"
-                        elif "未找到此" in error_msg:
-                            error_msg = "原视频已被删除。"
-                        else:
-                            error_msg = "其他原因"
-                    
-                    error_message = f"{bv} 下载失败！{error_msg if error_msg else ''}"
-                    self.logger.log_to_window(error_message, LogLevel.ERROR)
-                    self.logger.record_download_result(bv, False, error_msg)
-                event.set()
-            
-            # 只记录到本地日志，不显示在窗口
-            self.logger.log_to_file(f"{bv} 正在处理...")
-            self.downloader.start_download(bv, self.config.is_login, callback)
-            event.wait()
-            
+            if success:
+                self.logger.log_to_window(f"{bv} 下载成功！", LogLevel.SUCCESS)
+                self.logger.record_download_result(bv, True)
+                self.journal.mark_done(bv)
+                # 下载成功后更新缓存的BV号
+                if len(bv) == 12 and bv.startswith('BV'):  # 确保是有效的BV号
+                    self.config.update_cached_bv(bv)
+            else:
+                # error_msg 已由下载器分类为简短的失败原因
+                error_message = f"{bv} 下载失败！{error_msg if error_msg else ''}"
+                self.logger.log_to_window(error_message, LogLevel.ERROR)
+                self.logger.record_download_result(bv, False, error_msg)
+                self.journal.mark_failed(bv, error_msg)
         except Exception as e:
             error_msg = str(e)
             self.logger.log_to_window(f"{bv} 下载出错: {error_msg}", LogLevel.ERROR)
             self.logger.record_download_result(bv, False, error_msg)
+            self.journal.mark_failed(bv, error_msg)
+
+    def _enable_download_button(self):
+        """启动检查完成后启用下载按钮（正在处理任务时由冷却计时器启用）"""
+        if not self.download_cooldown:
+            self.download_button.config(state=tk.NORMAL)
 
     def _start_cooldown_timer(self):
-        """启动CD计时器"""
-        def cooldown():
-            time.sleep(1)  # 1秒CD
+        """启动CD计时器（由Tk事件循环计时，不再占用额外线程）"""
+        def end_cooldown():
             self.download_cooldown = False
-            self.root.after(0, lambda: self.download_button.config(state=tk.NORMAL))
-        
-        # 创建CD计时线程
-        cooldown_thread = threading.Thread(target=cooldown, daemon=True)
-        cooldown_thread.start()
+            self.download_button.config(state=tk.NORMAL)
+
+        self.root.after(1000, end_cooldown)  # 1秒CD
 
     def _change_save_path(self):
         """处理修改保存路径的操作"""
@@ -468,31 +539,50 @@ class BilibiliDownloaderGUI:
 
     def check_login_status_on_start(self):
         
-        """程序启动时检查登录状态"""
+        """程序启动时检查登录状态（cookie未变化时使用缓存，需要验证时在后台进行，不阻塞下载）"""
         def _check():
-            self.download_button.config(state="disabled")
             self.logger.log_to_file("开始检查登录状态...", LogLevel.INFO)
-            from src.utils.login import check_login_status
-            from src.utils.config import load_config
+            from src.utils.login import probe_login_status
+            from src.utils.config import sync_bbdown_path
+            from src.utils.login_cache import LoginStateCache
 
-            config = load_config()
-            bbdown_path = config.get("bbdown_path", "")
-            cached_bv = config.get("cached_bv", "BVaaaabbddee123")
+            # 查找BBDown（原先在导入配置模块时执行，现在移到后台线程）
+            sync_bbdown_path()
+            bbdown_path = self.config.bbdown_path
+            cached_bv = self.config.cached_bv
 
             self.logger.log_to_file(f"BBDown路径: {bbdown_path}", LogLevel.INFO)
             self.logger.log_to_file(f"缓存的BV号: {cached_bv}", LogLevel.INFO)
 
             if not bbdown_path:
                 self.logger.log_to_file("无法判断登录状态，无bbdown。", LogLevel.ERROR)
-                self.update_ui(lambda: self.login_status_label.config(text="无法判断登录状态，无bbdown。"))
-                self.download_button.config(state="normal")
+                self.update_ui(lambda: [
+                    self.login_status_label.config(text="无法判断登录状态，无bbdown。"),
+                    self._enable_download_button()
+                ])
                 return
 
-            self.logger.log_to_window("正在检查登录状态...", LogLevel.INFO)
-            is_logged_in = check_login_status(bbdown_path, cached_bv)
-            
-            # 更新配置中的登录状态
-            self.config.update_login_state(is_logged_in)
+            cache = LoginStateCache(self.config)
+            is_logged_in = cache.lookup(bbdown_path)
+
+            # BBDown路径已同步：恢复上次未完成的任务，没有任务时启用下载按钮，
+            # 不等待下面的登录验证（验证结果稍后单独更新登录状态）
+            self.update_ui(lambda: [
+                self._resume_unfinished_jobs(),
+                self._enable_download_button()
+            ])
+
+            if is_logged_in is not None:
+                self.logger.log_to_file(f"cookie未变化，使用缓存的登录状态: {is_logged_in}", LogLevel.INFO)
+                # 更新配置中的登录状态（cookie文件被删除时变为未登录）
+                self.config.update_login_state(is_logged_in)
+            else:
+                self.logger.log_to_window("正在检查登录状态...", LogLevel.INFO)
+                is_logged_in = cache.check(bbdown_path, cached_bv, probe_login_status)
+                if is_logged_in is None:
+                    # 网络慢导致无法判断时沿用上次的状态，不误报为未登录
+                    is_logged_in = self.config.is_login
+                    self.logger.log_to_window("登录状态检查超时，暂时沿用上次的登录状态", LogLevel.INFO)
             
             if is_logged_in:
                 self.update_ui(lambda: [
@@ -507,7 +597,6 @@ class BilibiliDownloaderGUI:
                     self.login_status_label.config(text="登录状态: 未登录"),
                     self.login_button.config(state="normal")
                 ])
-            self.download_button.config(state="normal")
 
         # 在新线程中异步检查登录状态
         self.logger.log_to_file("启动登录状态检查线程...", LogLevel.INFO)
@@ -516,13 +605,11 @@ class BilibiliDownloaderGUI:
     def login(self):
         """登录按钮回调函数"""
         from src.utils.login import loginmain
-        from src.utils.config import load_config
 
         self.login_button.config(state="disabled")
         self.login_status_label.config(text="登录状态: 正在登录...")
 
-        config = load_config()
-        bbdown_path = config.get("bbdown_path", "")
+        bbdown_path = self.config.bbdown_path
 
         if not bbdown_path:
             self.logger.log_to_file("无法登录：BBDown路径未找到，BBDown文件丢失。", LogLevel.ERROR)
@@ -536,7 +623,7 @@ class BilibiliDownloaderGUI:
         def on_login_result(success):
             self.update_ui(lambda: self._handle_login_result(success))
 
-        loginmain(bbdown_path, on_login_result)
+        loginmain(bbdown_path, on_login_result, self.dispatcher)
 
     def _handle_login_result(self, success: bool):
         """处理登录结果"""
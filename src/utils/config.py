@@ -1,113 +1,426 @@
+import atexit
 import json
 import os
 import sys
+import tempfile
+import threading
+import time
 from pathlib import Path
 
+
+# 默认配置（新建配置文件和补全缺失的配置项时使用）
+DEFAULT_CONFIG = {
+    "bbdown_path": "",
+    "cached_bv": "BVaaaabbddee123",
+    "suffix": " --show-all --dfn-priority \"<杜比视界,8K 超高清,HDR 真彩,4K 超清,1080P 60帧,1080P 高码率,1080P 高清,720P 高清,480P 清晰,360P 流畅>\" --download-danmaku -F \"<videoTitle>[<ownerName>][<dfn><fps>][<bvid>][P<pageNumber>_<pageTitle>]\" -p ALL --save-archives-to-file --skip-ai=false --delay-per-page=2 --work-dir ",
+    "is_login": False,
+    "need_login": True,
+    "save_path": os.path.join(os.path.expanduser("~"), "Desktop", "BVDownloader"),
+    "max_concurrency": 3,
+    "max_attempts": 3,
+    "retry_base_delay": 5,
+    "spawn_rate": 1.0,
+    "spawn_burst": 3,
+    "window_log_limit": 2000,
+    "log_view_lines": 1000,
+    "login_cookie_fingerprint": "",
+    "login_checked_at": 0,
+    "login_cache_ttl": 21600,
+    "stall_timeout": 300
+}
+
+# 进程的umask，新建配置文件时按普通文件的权限创建
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _atomic_write_json(path: str, data: dict):
+    """先写入同目录的临时文件再替换，避免写到一半时损坏配置文件"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # mkstemp创建的临时文件权限为0600，替换前改为原文件的权限
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except OSError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_path = tempfile.mkstemp(prefix=".bvconfig-", suffix=".tmp", dir=directory)
+    try:
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class ConfigStore:
+    """
+    配置文件的内存缓存
+
+    保存解析后的配置快照，按文件 mtime/size 判断是否被外部修改；
+    距上次检查不足 check_interval 秒时直接返回快照，不访问文件系统。
+    每次内容变化 version 加一，供依赖配置的缓存判断是否失效。
+
+    单项修改立即反映到快照，文件写入延后 flush_delay 秒合并进行，
+    写入时与文件中的最新内容合并，退出程序时会写入所有未保存的修改。
+    """
+
+    def __init__(self, path: str, defaults: dict, check_interval: float = 1.0,
+                 flush_delay: float = 1.0):
+        self.path = path
+        self.defaults = dict(defaults)
+        self.check_interval = check_interval
+        self.flush_delay = flush_delay
+        self.version = 0
+        self._lock = threading.RLock()
+        self._snapshot = None
+        self._stat_key = None
+        self._checked_at = 0.0
+        self._pending = {}  # 尚未写入文件的修改
+        self._timer = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _read(self) -> dict:
+        """从文件读取配置并补全缺失的键，文件不存在时创建默认配置"""
+        if not os.path.exists(self.path):
+            _atomic_write_json(self.path, self.defaults)
+            return dict(self.defaults)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        for key, value in self.defaults.items():
+            config.setdefault(key, value)
+        return config
+
+    def _replace(self, config: dict):
+        if config != self._snapshot:
+            self._snapshot = config
+            self.version += 1
+        self._stat_key = self._stat()
+        self._checked_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        """返回当前配置快照（只读，不要修改返回的字典）"""
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            if self._snapshot is not None and now - self._checked_at < self.check_interval:
+                return self._snapshot
+            stat_key = self._stat()
+            if self._snapshot is None or stat_key != self._stat_key:
+                try:
+                    config = self._read()
+                    config.update(self._pending)
+                    self._replace(config)
+                except Exception as e:
+                    print(f"加载配置文件失败: {e}")
+                    if self._snapshot is None:
+                        self._replace(dict(self.defaults))
+            self._checked_at = now
+            return self._snapshot
+
+    def get(self, key, default=None):
+        return self.snapshot().get(key, default)
+
+    def save(self, config: dict) -> bool:
+        """立即保存完整配置并更新快照"""
+        with self._lock:
+            try:
+                _atomic_write_json(self.path, config)
+            except Exception as e:
+                print(f"保存配置文件失败: {e}")
+                return False
+            self._cancel_timer()
+            self._pending.clear()
+            self._replace(dict(config))
+            return True
+
+    def update(self, key, value, flush: bool = False) -> bool:
+        """
+        修改单个配置项，稍后写入文件
+
+        延后写入失败时只记录日志并保留修改，下次写入时重试，返回值不反映写入结果；
+        需要确认已保存时传入 flush=True，立即写入并返回是否成功
+        """
+        with self._lock:
+            current = self.snapshot()
+            if key not in self._pending and key in current and current[key] == value:
+                return True
+            self._pending[key] = value
+            config = dict(current)
+            config[key] = value
+            self._snapshot = config
+            self.version += 1
+            if flush:
+                return self.flush()
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return True
+
+    def flush(self) -> bool:
+        """把未保存的修改写入文件"""
+        with self._lock:
+            self._cancel_timer()
+            if not self._pending:
+                return True
+            try:
+                config = self._read()
+            except Exception:
+                config = dict(self._snapshot or self.defaults)
+            config.update(self._pending)
+            try:
+                _atomic_write_json(self.path, config)
+            except Exception as e:
+                # 保留未保存的修改，下次修改或退出时重试
+                print(f"保存配置文件失败: {e}")
+                return False
+            self._pending.clear()
+            self._replace(config)
+            return True
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def invalidate(self):
+        """下次读取时重新检查文件"""
+        self._checked_at = 0.0
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_config_store(path: str, defaults: dict) -> ConfigStore:
+    """同一个配置文件在进程内共用一个缓存"""
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = ConfigStore(path, defaults)
+        return store
+
+
+def flush_config_stores():
+    """写入所有未保存的配置修改（程序退出时自动调用）"""
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
+
+
+atexit.register(flush_config_stores)
+
+
+def _invalidate_store(path: str):
+    with _stores_lock:
+        store = _stores.get(path)
+    if store is not None:
+        store.invalidate()
+
+
 class Config:
     def __init__(self):
         self.config_file = os.path.join(os.path.expanduser("~"), "AppData", "Local", "BVDownloader", "bvconfig.json")
-        self.default_config = {
-            "bbdown_path": "",
-            "cached_bv": "BVaaaabbddee123",
-            "suffix": " --show-all --dfn-priority \"<杜比视界,8K 超高清,HDR 真彩,4K 超清,1080P 60帧,1080P 高码率,1080P 高清,720P 高清,480P 清晰,360P 流畅>\" --download-danmaku -F \"<videoTitle>[<ownerName>][<dfn><fps>][<bvid>][P<pageNumber>_<pageTitle>]\" -p ALL --save-archives-to-file --skip-ai=false --delay-per-page=2 --work-dir ",
-            "is_login": False,
-            "need_login": True,
-            "save_path": os.path.join(os.path.expanduser("~"), "Desktop", "BVDownloader")
-        }
-        self.load_config()
+        self.default_config = dict(DEFAULT_CONFIG)
+        # 仅在本次运行中生效、不写入文件的配置（如命令行参数）
+        self.overrides = {}
+        self._overrides_version = 0
+        self._store = get_config_store(self.config_file, self.default_config)
 
-    def load_config(self):
-        """加载配置文件"""
+    @property
+    def version(self):
+        """配置版本，文件内容或临时覆盖变化时改变"""
+        self._store.snapshot()  # 检查文件是否被外部修改
+        return self._store.version, self._overrides_version
+
+    def set_override(self, key, value):
+        """设置只在本次运行中生效的配置项"""
+        self.overrides[key] = value
+        self._overrides_version += 1
+
+    def _get(self, key, default=None):
+        """读取配置项，临时覆盖优先"""
+        if key in self.overrides:
+            return self.overrides[key]
+        return self._store.get(key, default)
+
+    def _get_int(self, key, default: int, minimum: int = None) -> int:
         try:
-            if not os.path.exists(self.config_file):
-                # 确保目录存在
-                os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
-                # 创建默认配置
-                self.save_config(self.default_config)
-                return self.default_config
-
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                # 确保所有必要的键都存在
-                for key, value in self.default_config.items():
-                    if key not in config:
-                        config[key] = value
-                return config
-        except Exception as e:
-            print(f"加载配置文件失败: {e}")
-            return self.default_config
+            value = int(self._get(key, default))
+        except (TypeError, ValueError):
+            return default
+        return value if minimum is None else max(minimum, value)
+
+    def _get_float(self, key, default: float, minimum: float = None) -> float:
+        try:
+            value = float(self._get(key, default))
+        except (TypeError, ValueError):
+            return default
+        return value if minimum is None else max(minimum, value)
+
+    def _get_bool(self, key, default: bool) -> bool:
+        value = self._get(key, default)
+        if isinstance(value, str):
+            return value.strip().lower() in ("1", "true", "yes", "on")
+        return bool(value)
+
+    def _get_str(self, key, default: str = "") -> str:
+        value = self._get(key, default)
+        return default if value is None else str(value)
+
+    def load_config(self):
+        """加载配置文件（返回快照的副本）"""
+        return dict(self._store.snapshot())
 
     def save_config(self, config):
         """保存配置到文件"""
-        try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=4)
-            return True
-        except Exception as e:
-            print(f"保存配置文件失败: {e}")
-            return False
+        return self._store.save(config)
+
+    def _update_value(self, key, value, flush: bool = False):
+        """修改单个配置项，flush 为True时立即写入文件并返回是否保存成功"""
+        return self._store.update(key, value, flush)
+
+    def flush(self) -> bool:
+        """立即写入未保存的配置修改"""
+        return self._store.flush()
 
     def update_bbdown_path(self, path):
         """更新BBDown路径"""
-        config = self.load_config()
-        config["bbdown_path"] = path
-        return self.save_config(config)
+        return self._update_value("bbdown_path", path)
 
     def update_save_path(self, path):
-        """更新保存路径"""
-        config = self.load_config()
-        config["save_path"] = path
-        return self.save_config(config)
+        """更新保存路径（立即写入，返回是否保存成功）"""
+        return self._update_value("save_path", path, flush=True)
 
     def update_login_state(self, is_login):
         """更新登录状态"""
-        config = self.load_config()
-        config["is_login"] = is_login
-        return self.save_config(config)
+        return self._update_value("is_login", is_login)
 
     def update_need_login(self, need_login):
-        """更新是否需要登录才能下载"""
-        config = self.load_config()
-        config["need_login"] = need_login
-        return self.save_config(config)
+        """更新是否需要登录才能下载（立即写入，返回是否保存成功）"""
+        return self._update_value("need_login", need_login, flush=True)
+
+    def update_max_concurrency(self, max_concurrency: int) -> bool:
+        """更新最大并发下载数"""
+        return self._update_value("max_concurrency", max(1, int(max_concurrency)))
+
+    def update_login_cache(self, fingerprint: str, checked_at: float) -> bool:
+        """记录登录状态验证时的cookie哈希和时间"""
+        self._update_value("login_cookie_fingerprint", fingerprint)
+        return self._update_value("login_checked_at", checked_at)
 
     def update_cached_bv(self, bv: str) -> bool:
         """更新缓存的BV号"""
         try:
-            config = self.load_config()
-            config["cached_bv"] = bv
-            return self.save_config(config)
+            return self._update_value("cached_bv", bv)
         except Exception:
             return False
 
     @property
-    def bbdown_path(self):
+    def bbdown_path(self) -> str:
         """获取BBDown路径"""
-        return self.load_config().get("bbdown_path", "")
+        return self._get_str("bbdown_path")
 
     @property
-    def save_path(self):
+    def save_path(self) -> str:
         """获取保存路径"""
-        return self.load_config().get("save_path", "")
+        return self._get_str("save_path")
 
     @property
-    def is_login(self):
+    def is_login(self) -> bool:
         """获取登录状态"""
-        return self.load_config().get("is_login", False)
+        return self._get_bool("is_login", False)
 
     @property
-    def need_login(self):
+    def need_login(self) -> bool:
         """获取是否需要登录才能下载"""
-        return self.load_config().get("need_login", False)
+        return self._get_bool("need_login", False)
 
     @property
-    def suffix(self):
+    def suffix(self) -> str:
         """获取命令后缀"""
-        return self.load_config().get("suffix", "")
+        return self._get_str("suffix")
+
+    @property
+    def cached_bv(self) -> str:
+        """获取用于检查登录状态的BV号"""
+        return self._get_str("cached_bv", "BVaaaabbddee123")
+
+    @property
+    def max_concurrency(self) -> int:
+        """获取最大并发下载数（至少为1）"""
+        return self._get_int("max_concurrency", 1, minimum=1)
+
+    @property
+    def max_attempts(self) -> int:
+        """获取单个BV号的最大下载尝试次数（至少为1）"""
+        return self._get_int("max_attempts", 3, minimum=1)
+
+    @property
+    def retry_base_delay(self) -> float:
+        """获取重试退避的基础延迟（秒）"""
+        return self._get_float("retry_base_delay", 5.0, minimum=0.0)
+
+    @property
+    def spawn_rate(self) -> float:
+        """获取BBDown进程启动速率（个/秒，0表示不限速）"""
+        return self._get_float("spawn_rate", 1.0, minimum=0.0)
+
+    @property
+    def spawn_burst(self) -> int:
+        """获取BBDown进程启动的突发容量"""
+        return self._get_int("spawn_burst", 3, minimum=1)
+
+    @property
+    def stall_timeout(self) -> float:
+        """获取BBDown无输出且无文件写入多少秒后视为停滞（0表示不检测）"""
+        return self._get_float("stall_timeout", 300.0, minimum=0.0)
+
+    @property
+    def window_log_limit(self) -> int:
+        """获取内存中保留的窗口日志条数，更早的日志写入日志文件"""
+        return self._get_int("window_log_limit", 2000, minimum=100)
+
+    @property
+    def log_view_lines(self) -> int:
+        """获取日志窗口最多显示的行数"""
+        return self._get_int("log_view_lines", 1000, minimum=100)
+
+    @property
+    def login_cookie_fingerprint(self) -> str:
+        """获取上次验证登录状态时cookie文件的哈希"""
+        return self._get_str("login_cookie_fingerprint")
+
+    @property
+    def login_checked_at(self) -> float:
+        """获取上次验证登录状态的时间戳"""
+        return self._get_float("login_checked_at", 0.0)
+
+    @property
+    def login_cache_ttl(self) -> float:
+        """获取登录状态缓存的有效期（秒）"""
+        return self._get_float("login_cache_ttl", 21600.0, minimum=0.0)
 
     def get_config(self):
         """获取完整配置"""
-        return self.load_config()
+        config = self.load_config()
+        config.update(self.overrides)
+        return config
 
     def get_local_bbdown_path(self):
         """获取配置文件目录中的BBDown路径"""
@@ -214,8 +527,8 @@ def save_config(config):
     """
     try:
         config_path = os.path.join(os.path.expanduser("~"), "AppData", "Local", "BVDownloader", "bvconfig.json")
-        with open(config_path, "w", encoding="utf-8") as f:
-            json.dump(config, f, ensure_ascii=False, indent=4)
+        _atomic_write_json(config_path, config)
+        _invalidate_store(config_path)
         print(f"配置已保存到: {config_path}")
     except Exception as e:
         print(f"保存配置失败: {str(e)}")
@@ -228,15 +541,7 @@ def load_config():
         config_path = os.path.join(os.path.expanduser("~"), "AppData", "Local", "BVDownloader", "bvconfig.json")
         if not os.path.exists(config_path):
             print(f"配置文件不存在，将创建默认配置: {config_path}")
-            #default_config = {"bbdown_path": "", "cached_bv": "BVaaaabbddee123"}
-            default_config = {
-            "bbdown_path": "",
-            "cached_bv": "BVaaaabbddee123",
-            "suffix": " --show-all --dfn-priority \"<杜比视界,8K 超高清,HDR 真彩,4K 超清,1080P 60帧,1080P 高码率,1080P 高清,720P 高清,480P 清晰,360P 流畅>\" --download-danmaku -F \"<videoTitle>[<ownerName>][<dfn><fps>][<bvid>][P<pageNumber>_<pageTitle>]\" -p ALL --save-archives-to-file --skip-ai=false --delay-per-page=2 --work-dir ",
-            "is_login": False,
-            "need_login": True,
-            "save_path": os.path.join(os.path.expanduser("~"), "Desktop", "BVDownloader")
-        }
+            default_config = dict(DEFAULT_CONFIG)
             save_config(default_config)
             return default_config
             
@@ -248,10 +553,16 @@ def load_config():
         print(f"加载配置失败: {str(e)}")
         return {"bbdown_path": "", "cached_bv": "BVaaaabbddee123"}
 
-# 程序启动时，自动获取并保存BBDown路径
-config = load_config()
-bbdown_path = get_bbdown_path()
-if bbdown_path != config.get("bbdown_path", ""):
-    print(f"更新BBDown路径: {bbdown_path}")
-    config["bbdown_path"] = bbdown_path
-    save_config(config)
\ No newline at end of file
+def sync_bbdown_path():
+    """
+    查找BBDown并在路径变化时更新配置文件，返回找到的路径
+
+    按需调用（GUI在后台线程、命令行在开始下载前），不在导入模块时执行
+    """
+    config = load_config()
+    bbdown_path = get_bbdown_path()
+    if bbdown_path != config.get("bbdown_path", ""):
+        print(f"更新BBDown路径: {bbdown_path}")
+        config["bbdown_path"] = bbdown_path
+        save_config(config)
+    return bbdown_path
\ No newline at end of file
@@ -0,0 +1,123 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import threading
+import time
+from typing import Callable, Iterable, List, Optional
+
+# inotify 常量（见 <sys/inotify.h>）
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+
+# 等待期间检查 stop 事件的最长间隔（秒）
+_STOP_CHECK_INTERVAL = 0.5
+
+_libc = None
+
+
+def _load_libc():
+    """加载带inotify的libc，非Linux或加载失败时返回None"""
+    global _libc
+    if _libc is None:
+        _libc = False
+        if sys.platform.startswith("linux"):
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+                libc.inotify_init1.argtypes = [ctypes.c_int]
+                libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+                _libc = libc
+            except (OSError, AttributeError):
+                pass
+    return _libc or None
+
+
+class _Inotify:
+    """监视若干目录中文件的创建和写入"""
+
+    def __init__(self, directories: Iterable[str]):
+        libc = _load_libc()
+        if libc is None:
+            raise OSError("inotify不可用")
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1失败")
+        watched = 0
+        for directory in directories:
+            if libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK) >= 0:
+                watched += 1
+        if not watched:
+            self.close()
+            raise OSError("没有可监视的目录")
+
+    def wait(self, timeout: float) -> bool:
+        """等待文件事件，有事件返回True，超时返回False"""
+        timeout = None if timeout == float("inf") else max(0.0, timeout)
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            while os.read(self.fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def wait_for_file(paths: List[str], ready: Callable[[str], bool],
+                  timeout: Optional[float] = None, stop: Optional[threading.Event] = None,
+                  poll_interval: float = 0.1) -> Optional[str]:
+    """
+    等待 paths 中任意一个文件就绪（ready(path) 返回True），返回该路径
+
+    Linux下用inotify在文件写入时立即唤醒，其他平台按 poll_interval 轮询；
+    超时或 stop 被设置时返回None。
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def _check() -> Optional[str]:
+        for path in paths:
+            try:
+                if ready(path):
+                    return path
+            except OSError:
+                continue
+        return None
+
+    def _remaining() -> float:
+        return float("inf") if deadline is None else deadline - time.monotonic()
+
+    directories = {os.path.dirname(os.path.abspath(path)) for path in paths}
+    directories = [d for d in directories if os.path.isdir(d)]
+    try:
+        watcher = _Inotify(directories)
+    except OSError:
+        watcher = None
+
+    try:
+        while True:
+            found = _check()
+            if found or (stop is not None and stop.is_set()):
+                return found
+            remaining = _remaining()
+            if remaining <= 0:
+                return None
+            if watcher is not None:
+                wait = remaining if stop is None else min(remaining, _STOP_CHECK_INTERVAL)
+                watcher.wait(wait)
+            else:
+                time.sleep(min(remaining, poll_interval))
+    finally:
+        if watcher is not None:
+            watcher.close()
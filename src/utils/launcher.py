@@ -0,0 +1,63 @@
+import asyncio
+import os
+import shutil
+import subprocess
+from typing import List
+
+IS_WINDOWS = os.name == "nt"
+
+
+def resolve_argv(argv: List[str]) -> List[str]:
+    """
+    将argv[0]解析为可执行文件的完整路径
+
+    subprocess只有在可执行文件带目录时才会走posix_spawn快速路径，
+    同时也避免了依赖shell去查找PATH。
+    """
+    argv = [str(arg) for arg in argv]
+    if argv and not os.path.dirname(argv[0]):
+        found = shutil.which(argv[0])
+        if found:
+            argv[0] = found
+    return argv
+
+
+def platform_kwargs() -> dict:
+    """
+    获取当前平台启动子进程所需的额外参数
+
+    Windows: 隐藏控制台窗口
+    POSIX: close_fds=False，使subprocess可以使用posix_spawn/vfork快速启动
+           （Python创建的文件描述符默认不可继承，不会泄漏给子进程）
+    """
+    if IS_WINDOWS:
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        startupinfo.wShowWindow = subprocess.SW_HIDE
+        return {
+            "startupinfo": startupinfo,
+            "creationflags": subprocess.CREATE_NO_WINDOW,
+        }
+    return {"close_fds": False}
+
+
+def _merge_kwargs(kwargs: dict) -> dict:
+    merged = platform_kwargs()
+    merged.update(kwargs)
+    return merged
+
+
+def popen(argv: List[str], **kwargs) -> subprocess.Popen:
+    """不经过shell直接启动进程"""
+    return subprocess.Popen(resolve_argv(argv), **_merge_kwargs(kwargs))
+
+
+def run(argv: List[str], **kwargs) -> subprocess.CompletedProcess:
+    """不经过shell直接运行进程并等待结束，参数同subprocess.run"""
+    return subprocess.run(resolve_argv(argv), **_merge_kwargs(kwargs))
+
+
+async def create_subprocess(argv: List[str], **kwargs) -> asyncio.subprocess.Process:
+    """在asyncio事件循环中不经过shell直接启动进程"""
+    argv = resolve_argv(argv)
+    return await asyncio.create_subprocess_exec(*argv, **_merge_kwargs(kwargs))
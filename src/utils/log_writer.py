@@ -0,0 +1,174 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+_STOP = object()
+
+
+class LogFileWriter:
+    """
+    后台日志写入线程
+
+    调用方只把文本放进队列，不会阻塞在磁盘上；写入线程保持一个打开的文件句柄，
+    按批写入，每 flush_interval 秒或关闭时刷新到磁盘。
+    文件大小在内存中累计，超过 max_size 时轮转到 new_path_factory 返回的路径。
+    """
+
+    def __init__(self, path: str, max_size: int = 10 * 1024 * 1024,
+                 new_path_factory: Optional[Callable[[str], str]] = None,
+                 flush_interval: float = 0.5, batch_size: int = 1000):
+        self.path = path
+        self.max_size = max_size
+        self.new_path_factory = new_path_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._size = 0
+
+    def write(self, text: str):
+        """把文本加入写入队列（不阻塞）"""
+        if self._thread is None:
+            self._start()
+        self._queue.put(text)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待队列中已有的内容写入磁盘"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """写完剩余内容并停止写入线程"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _rotate(self):
+        """关闭当前文件并改名，之后的内容写入新文件"""
+        self._close_file()
+        if self.new_path_factory is not None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            new_path = self.new_path_factory(timestamp)
+            # 同一秒内多次轮转时避免覆盖之前的文件
+            index = 1
+            while os.path.exists(new_path):
+                new_path = self.new_path_factory(f"{timestamp}_{index}")
+                index += 1
+            os.replace(self.path, new_path)
+        self._open()
+
+    def _write_batch(self, parts):
+        data = "".join(parts)
+        try:
+            if self._file is None:
+                self._open()
+            if self.max_size and self._size >= self.max_size:
+                self._rotate()
+            self._file.write(data)
+            self._size += len(data.encode("utf-8"))
+        except Exception as e:
+            print(f"写入日志失败: {str(e)}")
+            self._close_file()
+
+    def _flush_file(self):
+        if self._file is not None:
+            try:
+                self._file.flush()
+            except Exception as e:
+                print(f"写入日志失败: {str(e)}")
+                self._close_file()
+
+    def _run(self):
+        dirty = False
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval if dirty else None)
+            except queue.Empty:
+                self._flush_file()
+                dirty = False
+                last_flush = time.monotonic()
+                continue
+
+            # 尽量多取一些，合并成一次写入
+            parts, waiters, stop = [], [], False
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    parts.append(item)
+                if stop or len(parts) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if parts:
+                self._write_batch(parts)
+                dirty = True
+            now = time.monotonic()
+            if waiters or stop or now - last_flush >= self.flush_interval:
+                self._flush_file()
+                dirty = False
+                last_flush = now
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                self._close_file()
+                return
+
+
+_writers: Dict[str, LogFileWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_log_writer(path: str, **kwargs) -> LogFileWriter:
+    """同一个日志文件在进程内共用一个写入线程"""
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = LogFileWriter(path, **kwargs)
+        return writer
+
+
+def close_log_writers():
+    """写完所有日志（程序退出时自动调用）"""
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(close_log_writers)
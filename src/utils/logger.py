@@ -1,9 +1,13 @@
 import logging
 import os
+import threading
+import time
+from collections import deque
 from datetime import datetime
 from typing import Callable, List, Dict, Optional
 from enum import Enum
 from .paths import app_paths
+from .log_writer import get_log_writer
 
 class LogLevel(Enum):
     SUCCESS = 'SUCCESS'
@@ -20,46 +24,62 @@ class LogEntry:
         return f"[{self.timestamp}] {self.message}"
 
 class VideoLogger:
-    def __init__(self):
+    def __init__(self, max_window_logs: int = 2000):
         self._callbacks: List[Callable[[str, LogLevel], None]] = []
         self.log_file = app_paths.log_file
         self.max_size = 10 * 1024 * 1024  # 10MB
         self.success_count = 0
         self.failed_bvs = []
         self.failed_reasons = {}
-        self.window_logs = []  # 存储窗口日志
+        self.skipped_count = 0  # 已下载过而跳过的视频数
+        # 存储窗口日志，超过 max_window_logs 条时把较早的一批写入日志文件
+        self.max_window_logs = max(1, max_window_logs)
+        self.window_logs = deque()
+        self._window_lock = threading.Lock()
+        self._stats_lock = threading.Lock()  # 并发下载时保护统计数据
+        self._timestamp_second = None
+        self._timestamp_text = ""
 
     def register_callback(self, callback: Callable[[str, LogLevel], None]):
         """注册日志回调函数"""
         self._callbacks.append(callback)
 
-    def _rotate_log_if_needed(self):
-        """检查并轮转日志文件"""
-        try:
-            if os.path.exists(self.log_file) and os.path.getsize(self.log_file) >= self.max_size:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                new_log_file = app_paths.get_new_log_file(timestamp)
-                os.rename(self.log_file, new_log_file)
-        except Exception as e:
-            print(f"日志轮转失败: {str(e)}")
+    @property
+    def writer(self):
+        """日志文件的后台写入线程（多个logger共用）"""
+        return get_log_writer(self.log_file, max_size=self.max_size,
+                              new_path_factory=app_paths.get_new_log_file)
+
+    def _timestamp(self) -> str:
+        """当前时间字符串，同一秒内复用格式化结果"""
+        now = int(time.time())
+        if now != self._timestamp_second:
+            self._timestamp_second = now
+            self._timestamp_text = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+        return self._timestamp_text
 
     def log_to_file(self, message: str, level: LogLevel = LogLevel.INFO):
-        """只写入文件的日志"""
-        try:
-            self._rotate_log_if_needed()
-            with open(self.log_file, "a", encoding="utf-8") as f:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                f.write(f"[{timestamp}] {message}\n")
-        except Exception as e:
-            print(f"写入日志失败: {str(e)}")
+        """只写入文件的日志（由后台线程写入，不阻塞调用方）"""
+        self.writer.write(f"[{self._timestamp()}] {message}\n")
+
+    def flush(self):
+        """等待已记录的日志写入文件"""
+        self.writer.flush()
 
     def log_to_window(self, message: str, level: LogLevel = LogLevel.INFO):
         """显示在窗口的日志，同时保存到内存"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        formatted_message = f"[{timestamp}] {message}"
+        formatted_message = f"[{self._timestamp()}] {message}"
         
         # 保存到内存
-        self.window_logs.append(formatted_message)
+        spilled = None
+        with self._window_lock:
+            self.window_logs.append(formatted_message)
+            if len(self.window_logs) > self.max_window_logs:
+                # 一次移出十分之一，避免每条日志都写文件
+                count = max(1, self.max_window_logs // 10)
+                spilled = [self.window_logs.popleft() for _ in range(count)]
+        if spilled:
+            self._write_window_block(spilled, "=== 窗口日志（较早部分）开始 ===")
         
         # 调用所有注册的回调函数（更新窗口显示）
         for callback in self._callbacks:
@@ -67,40 +87,60 @@ class VideoLogger:
 
     def save_window_logs(self):
         """将当前会话的窗口日志保存到文件"""
-        try:
-            self._rotate_log_if_needed()
-            with open(self.log_file, "a", encoding="utf-8") as f:
-                f.write("\n=== 窗口日志开始 ===\n")
-                for log in self.window_logs:
-                    f.write(f"{log}\n")
-                f.write("=== 窗口日志结束 ===\n\n")
-            # 清空当前会话的窗口日志
-            self.window_logs = []
-        except Exception as e:
-            print(f"保存窗口日志失败: {str(e)}")
+        with self._window_lock:
+            logs, self.window_logs = list(self.window_logs), deque()
+        self._write_window_block(logs, "=== 窗口日志开始 ===")
+
+    def _write_window_block(self, logs, header: str):
+        lines = [f"\n{header}\n"]
+        lines.extend(f"{log}\n" for log in logs)
+        lines.append("=== 窗口日志结束 ===\n\n")
+        self.writer.write("".join(lines))
 
     def record_download_result(self, bv: str, success: bool, reason: str = None):
-        """记录下载结果"""
-        if success:
-            self.success_count += 1
-        else:
-            self.failed_bvs.append(bv)
-            self.failed_reasons[bv] = reason
+        """记录下载结果（线程安全）"""
+        with self._stats_lock:
+            if success:
+                self.success_count += 1
+            else:
+                self.failed_bvs.append(bv)
+                self.failed_reasons[bv] = reason
+
+    def record_skipped(self, bv: str):
+        """记录已下载过而跳过的视频"""
+        with self._stats_lock:
+            self.skipped_count += 1
+
+    def reset_stats(self):
+        """重置下载统计"""
+        with self._stats_lock:
+            self.success_count = 0
+            self.skipped_count = 0
+            self.failed_bvs = []
+            self.failed_reasons = {}
 
     def print_summary(self):
         """只在窗口显示统计信息"""
-        total = self.success_count + len(self.failed_bvs)
+        with self._stats_lock:
+            success_count = self.success_count
+            skipped_count = self.skipped_count
+            failed_bvs = list(self.failed_bvs)
+            failed_reasons = dict(self.failed_reasons)
+
+        total = success_count + len(failed_bvs)
         summary = [
             "下载任务完成统计:",
             f"总计: {total} 个视频",
-            f"成功: {self.success_count} 个",
-            f"失败: {len(self.failed_bvs)} 个"
+            f"成功: {success_count} 个",
+            f"失败: {len(failed_bvs)} 个"
         ]
+        if skipped_count:
+            summary.append(f"跳过（已下载过）: {skipped_count} 个")
         
-        if self.failed_bvs:
+        if failed_bvs:
             summary.append("\n失败详情:")
-            for bv in self.failed_bvs:
-                summary.append(f"- {bv}: {self.failed_reasons.get(bv, '未知原因')}")
+            for bv in failed_bvs:
+                summary.append(f"- {bv}: {failed_reasons.get(bv, '未知原因')}")
 
         summary_text = "\n".join(summary)
         self.log_to_window(summary_text)
@@ -109,9 +149,7 @@ class VideoLogger:
         self.save_window_logs()
         
         # 重置计数器
-        self.success_count = 0
-        self.failed_bvs = []
-        self.failed_reasons = {}
+        self.reset_stats()
 
 # 创建全局logger实例
 logger = VideoLogger()
\ No newline at end of file
@@ -3,11 +3,10 @@ import os
 import subprocess
 import threading
 import tkinter as tk
-from PIL import Image, ImageTk
-import time
-from queue import Queue, Empty
 from dataclasses import dataclass
 from enum import Enum, auto
+from . import launcher
+from .file_watcher import wait_for_file
 
 # 全局状态标志和变量
 login_success = False
@@ -37,8 +36,10 @@ class LoginConfig:
     cached_bv: str
 
 class LoginManager:
-    def __init__(self):
-        self.message_queue = Queue()
+    def __init__(self, dispatcher=None):
+        # 登录事件通过分发器交给Tk主线程处理（UIDispatcher）
+        self.dispatcher = dispatcher
+        self.on_message = None
         self.root = None
         self.config = self._load_config()
     
@@ -52,18 +53,32 @@ class LoginManager:
         )
     
     def check_final_login_status(self) -> bool:
-        """验证最终登录状态"""
+        """
+        验证最终登录状态
+
+        新写入的cookie与缓存的哈希不同，会由BBDown验证后再缓存结果；
+        验证超时时只要cookie文件存在就视为登录成功，但不写入缓存，下次启动时重新验证
+        """
+        from .config import Config
+        from .login_cache import LoginStateCache
+
         if not self.config.bbdown_path or not self.config.cached_bv:
             print("无法验证登录：缺少必要配置")
             return False
+        cache = LoginStateCache(Config())
         try:
-            return check_login_status(self.config.bbdown_path, self.config.cached_bv)
+            result = cache.check(self.config.bbdown_path, self.config.cached_bv, probe_login_status)
         except Exception as e:
             print(f"验证登录状态时出错: {e}")
             return False
+        if result is None:
+            return cache.fingerprint(self.config.bbdown_path) is not None
+        return result
     
     def send_message(self, event: LoginEvent, data: dict = None):
-        self.message_queue.put(LoginMessage(event, data))
+        """在监控线程中调用，消息在Tk主线程中处理"""
+        if self.dispatcher is not None and self.on_message is not None:
+            self.dispatcher.post(self.on_message, LoginMessage(event, data))
 
 def is_absolute_path(path):
     return os.path.isabs(path)
@@ -162,6 +177,9 @@ def show_qr():
         return
 
     try:
+        # PIL只有显示二维码时才需要，延迟导入以加快程序启动
+        from PIL import Image, ImageTk
+
         # 打开并调整图片大小
         img = Image.open(qr_path)
         img = img.resize((300, 300), Image.LANCZOS if hasattr(Image, 'LANCZOS') else Image.ANTIALIAS)
@@ -277,37 +295,125 @@ def on_login_failed(error_msg: str):
         tk.Label(root, text=f"登录失败: {error_msg}", font=("", 12), fg="red").pack(pady=20)
         root.after(2000, root.destroy)  # 2秒后关闭窗口
 
-def monitor_output(login_manager):
-    """监控BBDown输出"""
-    while True:
-        line = current_process.stdout.readline()
-        if not line:
-            if current_process.poll() is not None:
-                break
-            continue
-        
-        line = line.strip()
-        if "██" not in line:  # 过滤掉二维码ASCII图案
-            print(f"[DEBUG] BBDown output: {line}")
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_TRAILER = b"IEND\xaeB`\x82"
+
+
+def is_qr_file_ready(path, last_sizes=None):
+    """
+    二维码文件是否已完整写入
+
+    PNG需要已写到IEND块；其他格式在大小连续两次检查不变时视为写完
+    （需要传入 last_sizes 字典记录上次的大小，否则不认为就绪）
+    """
+    size = os.path.getsize(path)
+    if size < len(_PNG_SIGNATURE):
+        return False
+    with open(path, "rb") as f:
+        header = f.read(len(_PNG_SIGNATURE))
+        if header != _PNG_SIGNATURE:
+            if last_sizes is None:
+                return False
+            previous = last_sizes.get(path)
+            last_sizes[path] = size
+            return previous == size
+        f.seek(max(0, size - len(_PNG_TRAILER)))
+        return f.read() == _PNG_TRAILER
+
+
+class LoginState(Enum):
+    STARTING = auto()  # 等待BBDown生成二维码
+    WAITING_QR = auto()  # BBDown已报告生成二维码，等待文件写完
+    QR_SHOWN = auto()  # 二维码已显示，等待扫码
+    EXPIRED = auto()  # 二维码过期
+    VERIFYING = auto()  # BBDown报告登录成功，等待进程退出后验证cookie
+    DONE = auto()
+
+
+class LoginMonitor:
+    """
+    BBDown登录进程的输出监视器
+
+    阻塞逐行读取输出，按状态机处理；二维码就绪由文件监视判断，
+    登录成功后等进程退出（cookie已写入）再验证，全程没有忙等和固定等待。
+    """
+
+    # 等待二维码文件写完的最长时间（秒）
+    QR_TIMEOUT = 10.0
+
+    def __init__(self, process, login_manager):
+        self.process = process
+        self.login_manager = login_manager
+        self._state = LoginState.STARTING
+        # 状态在读取线程、等待二维码线程和Tk线程中都会读写
+        self._state_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    @property
+    def state(self) -> LoginState:
+        with self._state_lock:
+            return self._state
+
+    def _transition(self, state: LoginState, expected: LoginState = None) -> bool:
+        """切换状态；指定 expected 时只有当前状态为 expected 才切换"""
+        with self._state_lock:
+            if expected is not None and self._state is not expected:
+                return False
+            self._state = state
+            return True
 
+    def run(self):
+        try:
+            for line in self.process.stdout:
+                line = line.strip()
+                if "██" not in line:  # 过滤掉二维码ASCII图案
+                    print(f"[DEBUG] BBDown output: {line}")
+                self.handle_line(line)
+        finally:
+            self.process.wait()
+            self._stopped.set()
+        if self.state is LoginState.VERIFYING:
+            self._verify()
+
+    def handle_line(self, line):
         if "生成二维码成功" in line:
-            time.sleep(0.5)  # 等待文件写入完成
-            login_manager.send_message(LoginEvent.QR_GENERATED)
-            
+            self._transition(LoginState.WAITING_QR)
+            threading.Thread(target=self._wait_for_qr, daemon=True).start()
+
         elif "二维码已过期" in line:
-            login_manager.send_message(LoginEvent.QR_EXPIRED)
-            
+            self._transition(LoginState.EXPIRED)
+            self.login_manager.send_message(LoginEvent.QR_EXPIRED)
+
         elif "登录成功" in line:
-            time.sleep(0.5)
-            if login_manager.check_final_login_status():
-                login_manager.send_message(LoginEvent.LOGIN_SUCCESS)
-                # 登录成功后清理二维码文件
-                cleanup_qr_files("登录成功")
-            else:
-                login_manager.send_message(LoginEvent.LOGIN_FAILED, {"error": "登录验证失败"})
-                cleanup_qr_files("登录失败")
+            self._transition(LoginState.VERIFYING)
+
+    def _wait_for_qr(self):
+        """二维码文件写完后通知显示"""
+        last_sizes = {}
+        qr_path = wait_for_file(get_possible_qr_paths(),
+                                lambda path: is_qr_file_ready(path, last_sizes),
+                                timeout=self.QR_TIMEOUT, stop=self._stopped)
+        if not self._transition(LoginState.QR_SHOWN, expected=LoginState.WAITING_QR):
+            return
+        if qr_path is None:
+            print("等待二维码文件超时")
+        # 找不到文件时由 show_qr 显示提示
+        self.login_manager.send_message(LoginEvent.QR_GENERATED)
+
+    def _verify(self):
+        if self.login_manager.check_final_login_status():
+            self.login_manager.send_message(LoginEvent.LOGIN_SUCCESS)
+            # 登录成功后清理二维码文件
+            cleanup_qr_files("登录成功")
+        else:
+            self.login_manager.send_message(LoginEvent.LOGIN_FAILED, {"error": "登录验证失败"})
+            cleanup_qr_files("登录失败")
+        self._transition(LoginState.DONE)
+
 
-            #login_manager.check_login_status_on_start()
+def monitor_output(login_manager):
+    """监控BBDown输出"""
+    LoginMonitor(current_process, login_manager).run()
 
 def start_login(login_manager):
     global current_process, cmd, root, qr_label, refresh_button, login_success, login_fail
@@ -324,19 +430,16 @@ def start_login(login_manager):
         cmd_str = " ".join(cmd)
         print(f"执行登录命令: {cmd_str}")
         
-        # 创建 STARTUPINFO 对象来隐藏控制台窗口
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = subprocess.SW_HIDE
+        # 删除上次残留的二维码，避免在BBDown写入新文件前把旧文件当作已就绪
+        cleanup_qr_files("启动登录")
 
-        # 启动BBDown进程
-        current_process = subprocess.Popen(
+        # 启动BBDown进程（不经过shell，Windows下隐藏控制台窗口）
+        current_process = launcher.popen(
             cmd, 
             stdout=subprocess.PIPE, 
             stderr=subprocess.STDOUT,
             universal_newlines=True, 
-            bufsize=1,
-            startupinfo=startupinfo
+            bufsize=1
         )
         
         # 启动监控线程 - 这部分之前漏掉了
@@ -349,18 +452,21 @@ def start_login(login_manager):
         login_fail = True
         root.destroy()
         return
-def loginmain(abs_bbdown_path, on_login_result=None):
+def loginmain(abs_bbdown_path, on_login_result=None, dispatcher=None):
     global cmd, root, global_login_manager, login_success
     
     # 重置登录状态
     login_success = False
     
-    # 创建登录管理器
-    login_manager = LoginManager()
-    global_login_manager = login_manager
-    
     # 保持使用 Toplevel
     root = tk.Toplevel()
+
+    # 创建登录管理器
+    if dispatcher is None:
+        from ..gui.dispatcher import UIDispatcher
+        dispatcher = UIDispatcher(root)
+    login_manager = LoginManager(dispatcher)
+    global_login_manager = login_manager
     login_manager.root = root
     root.title("BBDown 登录")
     root.geometry("400x450")
@@ -395,33 +501,27 @@ def loginmain(abs_bbdown_path, on_login_result=None):
     # 隐藏窗口，等待二维码生成
     root.withdraw()
     
-    def process_messages():
-        try:
-            while True:
-                try:
-                    msg = login_manager.message_queue.get_nowait()
-                    if msg.event == LoginEvent.QR_GENERATED:
-                        root.after(0, show_qr)
-                    elif msg.event == LoginEvent.QR_EXPIRED:
-                        root.after(0, expire_qr)
-                    elif msg.event == LoginEvent.LOGIN_SUCCESS:
-                        root.after(0, success_login)
-                        if on_login_result:
-                            on_login_result(True)
-                    elif msg.event == LoginEvent.LOGIN_FAILED:
-                        error_msg = msg.data.get("error", "未知错误") if msg.data else "未知错误"
-                        print(f"登录失败: {error_msg}")
-                        root.after(0, lambda: on_login_failed(error_msg))
-                        if on_login_result:
-                            on_login_result(False)
-                except Empty:
-                    break
-        finally:
-            if root.winfo_exists():
-                root.after(100, process_messages)
-    
-    # 启动消息处理
-    root.after(0, process_messages)
+    def handle_message(msg: LoginMessage):
+        """处理登录事件（在Tk主线程中调用）"""
+        login_window = login_manager.root
+        if not login_window.winfo_exists():
+            return
+        if msg.event == LoginEvent.QR_GENERATED:
+            show_qr()
+        elif msg.event == LoginEvent.QR_EXPIRED:
+            expire_qr()
+        elif msg.event == LoginEvent.LOGIN_SUCCESS:
+            success_login()
+            if on_login_result:
+                on_login_result(True)
+        elif msg.event == LoginEvent.LOGIN_FAILED:
+            error_msg = msg.data.get("error", "未知错误") if msg.data else "未知错误"
+            print(f"登录失败: {error_msg}")
+            on_login_failed(error_msg)
+            if on_login_result:
+                on_login_result(False)
+
+    login_manager.on_message = handle_message
     
     # 启动登录流程
     start_login(login_manager)
@@ -434,6 +534,13 @@ def check_login_status(bbdown_path, bv):
     检查登录状态，返回True表示已登录，False表示未登录。
     使用-info命令快速检查登录状态。
     """
+    return bool(probe_login_status(bbdown_path, bv))
+
+
+def probe_login_status(bbdown_path, bv):
+    """
+    运行BBDown检查登录状态，返回True/False；超时或出错无法判断时返回None
+    """
     if not bbdown_path or not os.path.exists(bbdown_path):
         print("登录判断：配置文件中bbdown为空或不存在")
         return False
@@ -444,18 +551,12 @@ def check_login_status(bbdown_path, bv):
         cmd_str = " ".join(cmd)
         print(f"执行检测登录状态的命令: {cmd_str}")
         
-        # 创建 STARTUPINFO 对象来隐藏控制台窗口
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = subprocess.SW_HIDE
-        
-        # 使用-info命令快速检查登录状态，添加 startupinfo 参数
-        result = subprocess.run(
+        # 使用-info命令快速检查登录状态（不经过shell，Windows下隐藏控制台窗口）
+        result = launcher.run(
             cmd,
             capture_output=True,
             text=True,
-            timeout=3,
-            startupinfo=startupinfo
+            timeout=3
         )
         output = result.stdout.lower()
         
@@ -478,10 +579,10 @@ def check_login_status(bbdown_path, bv):
         
     except subprocess.TimeoutExpired:
         print(f"登录状态检查超时，BV号: {bv}")
-        return False
+        return None
     except Exception as e:
         print(f"登录状态检查出错: {e}")
-        return False
+        return None
 
 # loginresult_=False
 # loginresult_=loginmain(r"D:\Softwares\BBDown_1.6.3_20240814_win-x64\bbdown.exe")
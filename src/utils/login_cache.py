@@ -0,0 +1,77 @@
+import hashlib
+import os
+import time
+from typing import Callable, Optional, Tuple
+from .config import Config
+
+# BBDown登录后把cookie保存在程序同目录的这个文件中
+COOKIE_FILE_NAME = "BBDown.data"
+
+
+class LoginStateCache:
+    """
+    登录状态缓存
+
+    以BBDown本地cookie文件（BBDown.data）的内容哈希为key，在配置中记录上次验证的结果。
+    cookie未变化且未超过TTL时直接使用缓存结果，不再启动BBDown进程验证；
+    cookie文件不存在时一定是未登录。
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self._hash_key: Optional[Tuple[str, int, int]] = None
+        self._hash: Optional[str] = None
+
+    @staticmethod
+    def cookie_path(bbdown_path: str) -> str:
+        return os.path.join(os.path.dirname(os.path.abspath(bbdown_path)), COOKIE_FILE_NAME)
+
+    def fingerprint(self, bbdown_path: str) -> Optional[str]:
+        """cookie文件的内容哈希，文件不存在时返回None（mtime/size未变时不重新计算）"""
+        path = self.cookie_path(bbdown_path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (path, st.st_mtime_ns, st.st_size)
+        if key != self._hash_key:
+            try:
+                with open(path, "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()
+            except OSError:
+                return None
+            self._hash_key, self._hash = key, digest
+        return self._hash
+
+    def lookup(self, bbdown_path: str) -> Optional[bool]:
+        """返回缓存的登录状态，需要重新验证时返回None"""
+        if not bbdown_path:
+            return None
+        fingerprint = self.fingerprint(bbdown_path)
+        if fingerprint is None:
+            return False
+        if fingerprint != self.config.login_cookie_fingerprint:
+            return None
+        if time.time() - self.config.login_checked_at > self.config.login_cache_ttl:
+            return None
+        return self.config.is_login
+
+    def store(self, bbdown_path: str, is_login: bool):
+        """记录验证结果"""
+        self.config.update_login_state(is_login)
+        self.config.update_login_cache(self.fingerprint(bbdown_path) or "", time.time())
+
+    def check(self, bbdown_path: str, cached_bv: str,
+              probe: Callable[[str, str], Optional[bool]]) -> Optional[bool]:
+        """
+        获取登录状态：优先使用缓存，否则调用 probe 验证并缓存结果
+
+        probe 无法确定结果（如网络超时）时返回None，此时不更新缓存
+        """
+        cached = self.lookup(bbdown_path)
+        if cached is not None:
+            return cached
+        result = probe(bbdown_path, cached_bv)
+        if result is not None:
+            self.store(bbdown_path, result)
+        return result
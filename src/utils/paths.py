@@ -14,14 +14,20 @@ class AppPaths:
         self.config_path = os.path.join(self.app_data_dir, "bvconfig.json")
         self.log_dir = os.path.join(self.app_data_dir, "logs")
         self.log_file = os.path.join(self.log_dir, "bilibili_downloader.log")
+        self.job_journal_path = os.path.join(self.app_data_dir, "jobs.db")
+        self.metrics_file = os.path.join(self.app_data_dir, "metrics.prom")
+        self.metrics_dir = os.path.join(self.app_data_dir, "metrics")
         
-        # 确保目录存在
-        self.ensure_directories()
+        # 目录在第一次写文件前才创建，导入本模块没有文件系统副作用
+        self._directories_ready = False
     
     def ensure_directories(self):
-        """确保所有必要的目录都存在"""
+        """确保所有必要的目录都存在（只在第一次调用时访问文件系统）"""
+        if self._directories_ready:
+            return
         os.makedirs(self.app_data_dir, exist_ok=True)
         os.makedirs(self.log_dir, exist_ok=True)
+        self._directories_ready = True
 
     def get_new_log_file(self, timestamp):
         """获取新的日志文件路径"""
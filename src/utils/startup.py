@@ -0,0 +1,101 @@
+import importlib.abc
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """包装原始loader，记录模块执行（导入）耗时"""
+
+    def __init__(self, loader, timer: "StartupTimer"):
+        self._loader = loader
+        self._timer = timer
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._timer.record_import(module.__name__, time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    """委托给其余finder查找模块，并用 _TimedLoader 包装结果"""
+
+    def __init__(self, timer: "StartupTimer"):
+        self._timer = timer
+        self._local = threading.local()
+
+    def find_spec(self, fullname, path, target=None):
+        if getattr(self._local, "busy", False):
+            return None
+        self._local.busy = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _TimedLoader(spec.loader, self._timer)
+                    return spec
+            return None
+        finally:
+            self._local.busy = False
+
+
+class StartupTimer:
+    """
+    启动耗时统计
+
+    记录每个模块的导入耗时（包含其导入的子模块）和启动过程中的关键时间点，
+    例如首个窗口显示的时间，用于衡量冷启动速度。
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.imports: Dict[str, float] = {}
+        self.marks: List[Tuple[str, float]] = []
+        self._finder: Optional[_TimingFinder] = None
+
+    def install(self):
+        """开始统计之后的模块导入耗时"""
+        if self._finder is None:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def uninstall(self):
+        """停止统计模块导入"""
+        if self._finder is not None and self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        self._finder = None
+
+    def record_import(self, name: str, seconds: float):
+        self.imports[name] = seconds
+
+    def mark(self, name: str):
+        """记录一个从程序启动开始计算的时间点"""
+        self.marks.append((name, time.perf_counter() - self.start))
+
+    def report(self, top: int = 15) -> str:
+        """生成启动耗时报告"""
+        lines = ["=== 启动耗时 ==="]
+        for name, elapsed in self.marks:
+            lines.append(f"{name}: {elapsed * 1000:.1f} ms")
+        if self.imports:
+            lines.append(f"最慢的 {min(top, len(self.imports))} 个模块导入（含子模块）:")
+            slowest = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)[:top]
+            for name, seconds in slowest:
+                lines.append(f"  {name}: {seconds * 1000:.1f} ms")
+        return "\n".join(lines)
+
+
+# 全局实例，在 main.py 中尽早导入
+startup_timer = StartupTimer()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+下载流水线基准测试
+
+用 tools/fake_bbdown.py 模拟BBDown，在不同并发数和批次大小下运行 VideoDownloader.download_batch，
+记录吞吐量（任务/秒）、CPU时间和峰值内存；每个批次大小还会重复下载一次同一批BV号，
+测试按BBDown.archives跳过已下载视频的路径。另外单独测试 CommandBuilder 生成命令和
+VideoLogger 写日志的速度。每个场景在独立的子进程和临时目录中运行，
+不会读写真实的配置、日志和下载目录，峰值内存也互不影响。
+
+示例：
+    python tools/benchmark.py
+    python tools/benchmark.py --concurrency 1,4,16 --batch-sizes 50,200 --duration 0.5
+    python tools/benchmark.py --fail-rate 0.2 --hang-rate 0.05 --stall-timeout 3 --json result.json
+
+注意：每个任务都会启动一个Python进程运行模拟程序，解释器启动开销计入子进程CPU时间。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    import resource  # Windows下不可用，此时只统计本进程CPU时间，不统计峰值内存
+except ImportError:
+    resource = None
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TOOLS_DIR)
+FAKE_BBDOWN = os.path.join(TOOLS_DIR, "fake_bbdown.py")
+
+# 命令行参数 -> 模拟程序的环境变量
+FAKE_OPTIONS = {
+    "latency": "FAKE_BBDOWN_LATENCY",
+    "duration": "FAKE_BBDOWN_DURATION",
+    "progress_lines": "FAKE_BBDOWN_PROGRESS_LINES",
+    "extra_lines": "FAKE_BBDOWN_EXTRA_LINES",
+    "size": "FAKE_BBDOWN_SIZE",
+    "fail_rate": "FAKE_BBDOWN_FAIL_RATE",
+    "not_found_rate": "FAKE_BBDOWN_NOT_FOUND_RATE",
+    "hang_rate": "FAKE_BBDOWN_HANG_RATE",
+    "seed": "FAKE_BBDOWN_SEED",
+}
+
+
+def parse_int_list(text: str) -> List[int]:
+    try:
+        values = [int(item) for item in text.split(",") if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"应为逗号分隔的整数: {text}")
+    if not values or min(values) < 1:
+        raise argparse.ArgumentTypeError(f"应为逗号分隔的正整数: {text}")
+    return values
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="BV下载器基准测试（使用模拟BBDown）")
+    parser.add_argument("--concurrency", type=parse_int_list, default=[1, 4, 8],
+                        help="并发数列表，逗号分隔（默认1,4,8）")
+    parser.add_argument("--batch-sizes", type=parse_int_list, default=[20, 100],
+                        help="批次大小列表，逗号分隔（默认20,100）")
+    parser.add_argument("--micro-iterations", type=int, default=100000,
+                        help="CommandBuilder和VideoLogger测试的调用次数（0表示跳过）")
+
+    fake = parser.add_argument_group("模拟BBDown")
+    fake.add_argument("--latency", type=float, default=0.2, help="解析阶段耗时（秒）")
+    fake.add_argument("--duration", type=float, default=1.0, help="下载耗时（秒）")
+    fake.add_argument("--progress-lines", type=int, default=20, help="每个下载阶段的进度行数")
+    fake.add_argument("--extra-lines", type=int, default=0, help="额外输出的日志行数")
+    fake.add_argument("--size", type=int, default=1024 * 1024, help="每个视频的文件大小（字节）")
+    fake.add_argument("--fail-rate", type=float, default=0.0, help="临时失败概率")
+    fake.add_argument("--not-found-rate", type=float, default=0.0, help="永久失败（视频不存在）概率")
+    fake.add_argument("--hang-rate", type=float, default=0.0, help="卡住不再输出的概率")
+    fake.add_argument("--seed", default=None, help="随机种子（指定后结果可复现）")
+
+    downloader = parser.add_argument_group("下载器配置")
+    downloader.add_argument("--stall-timeout", type=float, default=10.0, help="停滞判定时间（秒）")
+    downloader.add_argument("--max-attempts", type=int, default=3, help="每个任务的最大尝试次数")
+    downloader.add_argument("--retry-delay", type=float, default=0.1, help="重试退避基准时间（秒）")
+
+    parser.add_argument("--json", metavar="PATH", help="同时把结果保存为JSON文件")
+    # 内部参数：在子进程中运行单个场景
+    parser.add_argument("--worker", choices=["download", "rerun", "command_builder", "logger"],
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--workers", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--jobs", type=int, default=1, help=argparse.SUPPRESS)
+    return parser
+
+
+# ---------------------------------------------------------------- 子进程：运行单个场景
+
+class ResourceProbe:
+    """记录一段时间内的墙钟时间、CPU时间和峰值内存"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.cpu_started = self._cpu_times()
+
+    @staticmethod
+    def _cpu_times() -> Dict[str, float]:
+        if resource is None:
+            return {"self": time.process_time(), "children": 0.0}
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return {"self": own.ru_utime + own.ru_stime,
+                "children": children.ru_utime + children.ru_stime}
+
+    @staticmethod
+    def peak_rss_mb() -> Optional[float]:
+        """本进程的峰值常驻内存（MB）"""
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux以KB为单位，macOS以字节为单位
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+    def result(self, operations: int) -> Dict[str, Optional[float]]:
+        wall = time.perf_counter() - self.started
+        cpu = self._cpu_times()
+        return {
+            "wall_s": round(wall, 4),
+            "per_s": round(operations / wall, 2) if wall > 0 else None,
+            "cpu_s": round(cpu["self"] - self.cpu_started["self"], 4),
+            "children_cpu_s": round(cpu["children"] - self.cpu_started["children"], 4),
+            "peak_rss_mb": round(self.peak_rss_mb(), 1) if resource is not None else None,
+        }
+
+
+def isolate_app_paths(workdir: str):
+    """把日志、指标等应用数据目录指向临时目录"""
+    from src.utils.paths import app_paths
+    app_paths.app_data_dir = os.path.join(workdir, "appdata")
+    app_paths.config_path = os.path.join(app_paths.app_data_dir, "bvconfig.json")
+    app_paths.log_dir = os.path.join(app_paths.app_data_dir, "logs")
+    app_paths.log_file = os.path.join(app_paths.log_dir, "bilibili_downloader.log")
+    app_paths.job_journal_path = os.path.join(app_paths.app_data_dir, "jobs.db")
+    app_paths.metrics_file = os.path.join(app_paths.app_data_dir, "metrics.prom")
+    app_paths.metrics_dir = os.path.join(app_paths.app_data_dir, "metrics")
+
+
+def create_launcher(workdir: str) -> str:
+    """在临时目录中创建启动模拟程序的BBDown（BBDown.archives等文件也写在这里）"""
+    if os.name == "nt":
+        path = os.path.join(workdir, "BBDown.bat")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f'@"{sys.executable}" "{FAKE_BBDOWN}" %*\n')
+    else:
+        path = os.path.join(workdir, "BBDown")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_BBDOWN}" "$@"\n')
+        os.chmod(path, 0o755)
+    return path
+
+
+def sample_bvs(count: int) -> List[str]:
+    from src.core.bvid import aid_to_bv
+    return [aid_to_bv(170001 + i) for i in range(count)]
+
+
+def create_downloader(args):
+    """创建使用模拟BBDown、数据都在临时目录中的下载器"""
+    from src.utils.logger import VideoLogger
+    from src.core.downloader import VideoDownloader
+
+    downloader = VideoDownloader(VideoLogger())
+    config = downloader.config
+    config.set_override("bbdown_path", create_launcher(args.workdir))
+    config.set_override("save_path", os.path.join(args.workdir, "videos"))
+    config.set_override("suffix", "--skip-ai false --save-archives-to-file")
+    config.set_override("spawn_rate", 0)
+    config.set_override("stall_timeout", args.stall_timeout)
+    config.set_override("max_attempts", args.max_attempts)
+    config.set_override("retry_base_delay", args.retry_delay)
+    os.environ["FAKE_BBDOWN_HOME"] = args.workdir
+    return downloader
+
+
+def run_batch(downloader, bvs: List[str], workers: int) -> dict:
+    """与GUI和命令行模式相同：先跳过BBDown.archives中已有的BV号，再下载其余的"""
+    results = {"success": 0, "failed": 0, "skipped": 0}
+    lock = threading.Lock()
+
+    def on_result(key, success, error_msg=None):
+        with lock:
+            results["success" if success else "failed"] += 1
+
+    def on_skip(key):
+        with lock:
+            results["skipped"] += 1
+
+    attempts_before = downloader.metrics.attempts.value()
+    probe = ResourceProbe()
+    new_bvs = downloader.filter_downloaded(bvs, on_skip)
+    downloader.download_batch(new_bvs, False, on_result, max_workers=workers)
+    downloader.logger.flush()
+    report = probe.result(len(bvs))
+    report.update(results)
+    report["attempts"] = int(downloader.metrics.attempts.value() - attempts_before)
+    return report
+
+
+def run_download_worker(args) -> dict:
+    downloader = create_downloader(args)
+    report = run_batch(downloader, sample_bvs(args.jobs), args.workers)
+    downloader.engine.shutdown()
+    return report
+
+
+def run_rerun_worker(args) -> dict:
+    """同一批BV号下载两次，只统计第二次：已下载的BV号应全部跳过，不启动BBDown"""
+    downloader = create_downloader(args)
+    bvs = sample_bvs(args.jobs)
+    run_batch(downloader, bvs, args.workers)
+    report = run_batch(downloader, bvs, args.workers)
+    downloader.engine.shutdown()
+    return report
+
+
+def run_command_builder_worker(args) -> dict:
+    from src.utils.config import Config
+    from src.core.command_builder import CommandBuilder
+
+    config = Config()
+    config.set_override("bbdown_path", os.path.join(args.workdir, "BBDown"))
+    config.set_override("save_path", os.path.join(args.workdir, "videos"))
+    builder = CommandBuilder(config)
+    bvs = sample_bvs(1000)
+    probe = ResourceProbe()
+    for i in range(args.jobs):
+        builder.build_command(bvs[i % len(bvs)], False, i % 3 or None)
+    return probe.result(args.jobs)
+
+
+def run_logger_worker(args) -> dict:
+    from src.utils.logger import VideoLogger
+
+    logger = VideoLogger()
+    line = " [#####-----] 50.00% 10.00 MB/20.00 MB - 2.50 MB/s"
+    probe = ResourceProbe()
+    for i in range(args.jobs):
+        logger.log_to_file(line)
+    logger.flush()
+    return probe.result(args.jobs)
+
+
+WORKERS = {
+    "download": run_download_worker,
+    "rerun": run_rerun_worker,
+    "command_builder": run_command_builder_worker,
+    "logger": run_logger_worker,
+}
+
+
+def run_worker(args) -> int:
+    sys.path.insert(0, ROOT_DIR)
+    # Config把配置文件放在用户目录下，子进程中把用户目录指向临时目录
+    os.environ["HOME"] = os.environ["USERPROFILE"] = args.workdir
+    isolate_app_paths(args.workdir)
+    report = WORKERS[args.worker](args)
+    print(json.dumps(report))
+    return 0
+
+
+# ---------------------------------------------------------------- 主进程：调度场景并汇总
+
+def run_scenario(args, worker: str, jobs: int, workers: int = 1) -> dict:
+    """在子进程中运行一个场景，返回其结果"""
+    env = dict(os.environ)
+    for option, name in FAKE_OPTIONS.items():
+        value = getattr(args, option)
+        if value is not None:
+            env[name] = str(value)
+    with tempfile.TemporaryDirectory(prefix="bvbench_") as workdir:
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", worker,
+               "--workdir", workdir, "--jobs", str(jobs), "--workers", str(workers),
+               "--stall-timeout", str(args.stall_timeout),
+               "--max-attempts", str(args.max_attempts),
+               "--retry-delay", str(args.retry_delay)]
+        completed = subprocess.run(cmd, env=env, cwd=ROOT_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"场景 {worker} 运行失败:\n{completed.stderr.strip()}")
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    report.update({"scenario": worker, "jobs": jobs, "concurrency": workers})
+    return report
+
+
+def format_value(value, digits: int = 2) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.{digits}f}"
+    return str(value)
+
+
+def print_table(title: str, rows: List[dict], columns: List[tuple]):
+    print(f"\n{title}")
+    headers = [header for header, _ in columns]
+    cells = [[format_value(row.get(key)) for _, key in columns] for row in rows]
+    widths = [max(len(h), *(len(c[i]) for c in cells)) for i, h in enumerate(headers)]
+    print("  ".join(h.rjust(w) for h, w in zip(headers, widths)))
+    for row in cells:
+        print("  ".join(c.rjust(w) for c, w in zip(row, widths)))
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.worker:
+        return run_worker(args)
+
+    results = []
+    download_rows = []
+    for batch_size in args.batch_sizes:
+        for workers in args.concurrency:
+            print(f"下载: 批次 {batch_size}, 并发 {workers} ...", file=sys.stderr, flush=True)
+            row = run_scenario(args, "download", batch_size, workers)
+            download_rows.append(row)
+        # 重复下载同一批：测试按BBDown.archives跳过已下载视频的开销
+        workers = max(args.concurrency)
+        print(f"重复下载: 批次 {batch_size}, 并发 {workers} ...", file=sys.stderr, flush=True)
+        download_rows.append(run_scenario(args, "rerun", batch_size, workers))
+    results.extend(download_rows)
+    print_table("VideoDownloader.download_batch", download_rows, [
+        ("场景", "scenario"), ("批次", "jobs"), ("并发", "concurrency"), ("任务/秒", "per_s"),
+        ("耗时(s)", "wall_s"), ("成功", "success"), ("失败", "failed"), ("跳过", "skipped"),
+        ("启动次数", "attempts"),
+        ("CPU(s)", "cpu_s"), ("BBDown CPU(s)", "children_cpu_s"), ("峰值内存(MB)", "peak_rss_mb"),
+    ])
+
+    if args.micro_iterations > 0:
+        micro_rows = []
+        for worker in ("command_builder", "logger"):
+            print(f"{worker}: {args.micro_iterations} 次 ...", file=sys.stderr, flush=True)
+            micro_rows.append(run_scenario(args, worker, args.micro_iterations))
+        results.extend(micro_rows)
+        print_table("CommandBuilder / VideoLogger", micro_rows, [
+            ("场景", "scenario"), ("次数", "jobs"), ("次/秒", "per_s"), ("耗时(s)", "wall_s"),
+            ("CPU(s)", "cpu_s"), ("峰值内存(MB)", "peak_rss_mb"),
+        ])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"options": {k: v for k, v in vars(args).items()
+                                   if k not in ("worker", "workdir", "workers", "jobs")},
+                       "results": results}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+模拟BBDown的命令行程序，用于基准测试和离线调试
+
+输出格式与BBDown一致（阶段日志、\r 刷新的进度条、"任务完成"、常见错误信息、
+登录时生成qrcode.png和BBDown.data），行为通过环境变量调节：
+
+    FAKE_BBDOWN_LATENCY         解析阶段耗时（秒，默认0.2）
+    FAKE_BBDOWN_DURATION        视频+音频下载耗时（秒，默认1.0）
+    FAKE_BBDOWN_PROGRESS_LINES  每个下载阶段输出的进度行数（默认20）
+    FAKE_BBDOWN_EXTRA_LINES     额外输出的调试日志行数（默认0）
+    FAKE_BBDOWN_SIZE            写入的视频文件大小（字节，默认1MB）
+    FAKE_BBDOWN_FAIL_RATE       临时失败（网络错误）概率（默认0）
+    FAKE_BBDOWN_NOT_FOUND_RATE  永久失败（视频不存在）概率（默认0）
+    FAKE_BBDOWN_HANG_RATE       卡住不再输出的概率（默认0）
+    FAKE_BBDOWN_SEED            随机种子，与BV号和下载次数一起决定本次的结果
+    FAKE_BBDOWN_LOGIN_DELAY     登录时从生成二维码到登录成功的时间（秒，默认2）
+    FAKE_BBDOWN_QR_EXPIRE       设为1时登录的二维码过期
+    FAKE_BBDOWN_HOME            BBDown.archives、BBDown.data和qrcode.png所在目录（默认为本脚本所在目录）
+
+用法与BBDown相同，例如：
+    python tools/fake_bbdown.py BV1xx411c7mD --work-dir D:/Videos -p 1 --save-archives-to-file
+    python tools/fake_bbdown.py login
+    python tools/fake_bbdown.py -info BV1xx411c7mD
+"""
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+# 真实BBDown把这些文件放在程序所在目录
+APP_DIR = os.environ.get("FAKE_BBDOWN_HOME") or SCRIPT_DIR
+
+try:
+    from src.core.bvid import bv_to_aid
+except ImportError:
+    bv_to_aid = None
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def log(message: str):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    print(f"[{timestamp}] - {message}", flush=True)
+
+
+def format_size(num_bytes: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.2f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.2f} GB"
+
+
+def tiny_png() -> bytes:
+    """1x1像素的PNG图片"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+    header = struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(b"\x00\x00")) + chunk(b"IEND", b""))
+
+
+def next_attempt(bv: str) -> int:
+    """记录并返回该BV号是第几次下载"""
+    directory = os.path.join(APP_DIR, ".fake_bbdown_attempts")
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, bv), "a+", encoding="utf-8") as f:
+        f.write(".")
+        f.seek(0)
+        return len(f.read())
+
+
+def parse_args(argv):
+    """只解析模拟需要的参数，其余参数忽略"""
+    args = {"target": None, "work_dir": os.getcwd(), "page": None, "archives": False,
+            "login": False, "info": False}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        name, _, inline_value = arg.partition("=")
+        if arg == "login":
+            args["login"] = True
+        elif arg == "-info":
+            args["info"] = True
+        elif name == "--work-dir":
+            if inline_value:
+                args["work_dir"] = inline_value
+            elif i + 1 < len(argv):
+                args["work_dir"] = argv[i + 1]
+                i += 1
+        elif name in ("-p", "--select-page"):
+            if not inline_value and i + 1 < len(argv):
+                inline_value = argv[i + 1]
+                i += 1
+            args["page"] = inline_value
+        elif arg == "--save-archives-to-file":
+            args["archives"] = True
+        elif arg.startswith("-"):
+            # 带值的参数：下一个参数不是选项时视为它的值
+            if not inline_value and i + 1 < len(argv) and not argv[i + 1].startswith("-"):
+                i += 1
+        elif args["target"] is None:
+            args["target"] = arg
+        i += 1
+    return args
+
+
+def download_stage(label: str, total_bytes: int, duration: float, lines: int, out_file):
+    """输出一个下载阶段的进度条，并按进度写入文件"""
+    log(f"开始下载{label}...")
+    lines = max(1, lines)
+    written = 0
+    started = time.monotonic()
+    for step in range(1, lines + 1):
+        time.sleep(duration / lines)
+        target = total_bytes * step // lines
+        if out_file is not None and target > written:
+            out_file.write(b"\0" * (target - written))
+            out_file.flush()
+        written = target
+        percent = step * 100.0 / lines
+        speed = written / max(time.monotonic() - started, 1e-6)
+        bar = "#" * int(percent // 10)
+        sys.stdout.write(f" [{bar:<10}] {percent:.2f}% {format_size(written)}/{format_size(total_bytes)}"
+                         f" - {format_size(speed)}/s\r")
+        sys.stdout.flush()
+    sys.stdout.write("\n")
+
+
+def run_download(args) -> int:
+    target = args["target"] or ""
+    bv = target.split("/")[-1].split("?")[0]
+    seed = os.environ.get("FAKE_BBDOWN_SEED")
+    # 指定种子时结果由BV号和第几次下载决定，重复运行可复现（重试时可能成功）
+    rng = random.Random(f"{seed}:{bv}:{next_attempt(bv)}" if seed is not None else None)
+
+    latency = env_float("FAKE_BBDOWN_LATENCY", 0.2)
+    duration = env_float("FAKE_BBDOWN_DURATION", 1.0)
+    progress_lines = int(env_float("FAKE_BBDOWN_PROGRESS_LINES", 20))
+    extra_lines = int(env_float("FAKE_BBDOWN_EXTRA_LINES", 0))
+    size = int(env_float("FAKE_BBDOWN_SIZE", 1024 * 1024))
+
+    print("BBDown version 1.6.3, Bilibili Downloader.", flush=True)
+    log("检测账号登录...")
+    log("获取aid...")
+    try:
+        aid = bv_to_aid(bv) if bv_to_aid else abs(hash(bv)) % 10 ** 9
+    except ValueError:
+        log("输入有误: BV号无效")
+        return 1
+    time.sleep(latency / 2)
+
+    roll = rng.random()
+    not_found_rate = env_float("FAKE_BBDOWN_NOT_FOUND_RATE", 0)
+    fail_rate = env_float("FAKE_BBDOWN_FAIL_RATE", 0)
+    hang_rate = env_float("FAKE_BBDOWN_HANG_RATE", 0)
+    if roll < not_found_rate:
+        log("获取aid结束: {}".format(aid))
+        print("BBDown.Core.Util.HTTPUtil: -404 啥都木有", flush=True)
+        log("ERROR: 未找到此视频")
+        return 1
+    roll -= not_found_rate
+    if roll < fail_rate:
+        print("System.Net.Http.HttpRequestException: Connection reset by peer", flush=True)
+        return 1
+    roll -= fail_rate
+
+    log(f"获取aid结束: {aid}")
+    log("获取视频信息...")
+    time.sleep(latency / 2)
+    log(f"视频标题: 模拟视频 {bv}")
+    page = args["page"] or "1"
+    log(f"共计1个分P, 已选择：{page}")
+    for i in range(extra_lines):
+        log(f"调试信息 {i}: 请求 https://api.bilibili.com/x/player/playurl?bvid={bv}")
+    log(f"开始解析P{page}... (1 of 1)")
+
+    if roll < hang_rate:
+        # 模拟网络断开后卡住：不再输出也不再写文件
+        while True:
+            time.sleep(3600)
+
+    tmp_dir = os.path.join(args["work_dir"], str(aid))
+    os.makedirs(tmp_dir, exist_ok=True)
+    video_size, audio_size = size * 9 // 10, size - size * 9 // 10
+    with open(os.path.join(tmp_dir, f"{aid}.P{page}.mp4"), "wb") as f:
+        download_stage(f"P{page}视频", video_size, duration * 0.8, progress_lines, f)
+    with open(os.path.join(tmp_dir, f"{aid}.P{page}.m4a"), "wb") as f:
+        download_stage(f"P{page}音频", audio_size, duration * 0.2, max(1, progress_lines // 4), f)
+    log("下载弹幕...")
+    log("开始合并音视频...")
+    output_path = os.path.join(args["work_dir"], f"模拟视频 {bv}[P{page}].mp4")
+    with open(output_path, "wb") as out:
+        for name in sorted(os.listdir(tmp_dir)):
+            path = os.path.join(tmp_dir, name)
+            with open(path, "rb") as part:
+                out.write(part.read())
+            os.remove(path)
+    os.rmdir(tmp_dir)
+
+    if args["archives"]:
+        with open(os.path.join(APP_DIR, "BBDown.archives"), "a", encoding="utf-8") as f:
+            f.write(f"{aid}|")
+    log("任务完成")
+    return 0
+
+
+def run_info(args) -> int:
+    print("BBDown version 1.6.3, Bilibili Downloader.", flush=True)
+    log("检测账号登录...")
+    if os.path.exists(os.path.join(APP_DIR, "BBDown.data")):
+        log("加载本地cookie...")
+        log("获取aid...")
+        log("获取aid结束: 1")
+    else:
+        log("尚未登录")
+    return 0
+
+
+def run_login() -> int:
+    qr_path = os.path.join(APP_DIR, "qrcode.png")
+    print("BBDown version 1.6.3, Bilibili Downloader.", flush=True)
+    log("获取登录地址...")
+    with open(qr_path, "wb") as f:
+        f.write(tiny_png())
+    log("生成二维码成功：qrcode.png, 请打开并扫描")
+    print("█▀▀▀▀▀█ ▄▀▄ █▀▀▀▀▀█", flush=True)
+    time.sleep(env_float("FAKE_BBDOWN_LOGIN_DELAY", 2.0))
+    if os.environ.get("FAKE_BBDOWN_QR_EXPIRE") == "1":
+        log("二维码已过期, 请重新执行登录指令.")
+        return 0
+    log("登录成功: SESSDATA=fake")
+    with open(os.path.join(APP_DIR, "BBDown.data"), "w", encoding="utf-8") as f:
+        f.write("SESSDATA=fake; bili_jct=fake")
+    try:
+        os.remove(qr_path)
+    except OSError:
+        pass
+    return 0
+
+
+def main(argv=None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args["login"]:
+        return run_login()
+    if args["info"]:
+        return run_info(args)
+    return run_download(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())